@@ -4,61 +4,852 @@ Metadata Checker Tool with GUI - Termux Compatible Version with Logging
 """
 
 import os
+import re
 import sys
+import gzip
 import json
+import mmap
+import time
+import queue
+import shutil
+import zipfile
+import sqlite3
+import heapq
+import hashlib
+import tempfile
+import atexit
 import argparse
+import contextlib
+import shlex
+import selectors
+import signal
+import threading
 import subprocess
+import ctypes
+import platform
+import struct
+import socket
+import hmac
+import ipaddress
+import http.client
+from urllib.parse import urlsplit, urljoin, quote, unquote
 from pathlib import Path
-from datetime import datetime
-from flask import Flask, render_template, request, jsonify, send_file
+from datetime import datetime, timezone
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from flask import Flask, Request, Response, render_template, request, jsonify, send_file, stream_with_context
 from werkzeug.utils import secure_filename
 import mimetypes
 
+try:
+    import msgpack
+except ImportError:  # Optional, only needed for ?format=msgpack
+    msgpack = None
+try:
+    import fcntl
+except ImportError:  # Not on Windows, only needed when several server processes share the upload folder
+    fcntl = None
+try:
+    import resource
+except ImportError:  # Not on Windows, tools then run without rlimits
+    resource = None
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # Optional, only needed for --workers/--threads
+    BaseApplication = None
+
 app = Flask(__name__, template_folder='templates', static_folder='static')
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max file size untuk Termux
 app.config['UPLOAD_FOLDER'] = 'uploads'
+app.config['OBJECT_FOLDER'] = os.path.join('uploads', '.objects')  # Isi file disimpan sekali per SHA-256, upload adalah hardlink
+app.config['EXTRACTOR_WORKERS'] = 8  # Jumlah tool yang boleh berjalan bersamaan
+app.config['EXTRACTION_DEADLINE'] = 30  # Batas waktu (detik) untuk semua tool per request
+app.config['PROCESS_MEMORY_LIMIT'] = 2 * 1024 * 1024 * 1024  # Batas address space per proses tool (None = tanpa batas)
+app.config['PROCESS_CPU_LIMIT'] = 60  # Batas CPU time (detik) per proses tool, bukan exiftool -stay_open (None = tanpa batas)
+app.config['PROCESS_OUTPUT_LIMIT'] = 32 * 1024 * 1024  # Output tool lebih dari ini dianggap gagal dan prosesnya di-kill
+app.config['PROCESS_NICE'] = 10  # Prioritas CPU tool (0-19), agar web server tetap responsif
+app.config['PROCESS_IONICE'] = 7  # Prioritas I/O best-effort tool (0-7, 7 = paling rendah, None = tidak diubah)
+app.config['EXIFTOOL_POOL_SIZE'] = 2  # Jumlah proses exiftool -stay_open, 0 = satu proses per panggilan
+app.config['EXIFTOOL_MAX_REQUESTS'] = 500  # Restart proses exiftool setelah sekian request
+app.config['EXIFTOOL_HEALTH_INTERVAL'] = 60  # Ping proses exiftool yang idle lebih lama dari ini (detik)
+app.config['EXIFTOOL_BATCH_FILES'] = 200  # Maksimal file per panggilan exiftool batch
+app.config['EXIFTOOL_BATCH_BYTES'] = 512 * 1024 * 1024  # Maksimal total ukuran file per batch
+app.config['BATCH_WRITE_MAX_FILES'] = 10000  # Maksimal file per POST /api/metadata/batch
+app.config['JOB_WORKERS'] = 2  # Thread yang memproses job multi-file
+app.config['JOB_QUEUE_SIZE'] = 16  # Job yang boleh mengantri, lebih dari ini dijawab 429
+app.config['JOB_HISTORY'] = 100  # Job selesai yang hasilnya masih disimpan
+app.config['JOB_MAX_FILES'] = 1000  # Maksimal file per job (termasuk isi zip)
+app.config['JOB_DB'] = None  # Path SQLite status job, agar job terlihat dari semua worker (otomatis saat --workers > 1)
+app.config['SERVER_KEEPALIVE'] = 5  # Detik koneksi HTTP keep-alive yang idle tetap dibuka
+app.config['SERVER_TIMEOUT'] = None  # Batas waktu request dan drain saat SIGTERM (None = EXTRACTION_DEADLINE + 30)
+app.config['FFPROBE_PROBESIZE'] = 5 * 1024 * 1024  # Byte yang dibaca ffprobe untuk mendeteksi stream (tanpa ?deep=1)
+app.config['FFPROBE_ANALYZEDURATION'] = 5  # Detik media yang dianalisis ffprobe (tanpa ?deep=1)
+app.config['MEDIAINFO_PARSE_SPEED'] = 0  # 0 = header saja, 1 = seluruh file (tanpa ?deep=1)
+app.config['MEDIA_FIELDS'] = [  # Jika ffprobe sudah menjawab semua ini, mediainfo tidak dijalankan
+    'format', 'duration', 'video.codec', 'video.width', 'video.height', 'video.frame_rate',
+    'audio.codec', 'audio.sample_rate', 'audio.channels',
+]
+app.config['STRINGS_LIMIT'] = 30  # Maksimal interesting strings, scan berhenti setelah ini tercapai
+app.config['STRINGS_MAX_LENGTH'] = 1024  # Panjang maksimal satu string di hasil
+app.config['ZIPINFO_MAX_ENTRIES'] = 200  # Entry zip per halaman (?zip_offset=&zip_limit=)
+app.config['ZIP_BOMB_RATIO'] = 100  # Rasio kompresi yang dianggap mencurigakan
+app.config['ZIP_BOMB_MAX_SIZE'] = 1024 * 1024 * 1024  # Ukuran total setelah extract yang dianggap mencurigakan
+app.config['ZIP_BOMB_MAX_ENTRIES'] = 10000  # Jumlah entry yang dianggap mencurigakan
+app.config['TOOL_PROBE_INTERVAL'] = 3600  # Cek ulang versi tools setiap sekian detik (0 = hanya saat start dan SIGHUP)
+app.config['LOG_LEVEL'] = 'RUNNING'  # DEBUG, RUNNING (langkah per tool), INFO, WARNING, ERROR
+app.config['LOG_FORMAT'] = 'text'  # Format log di console: 'text' atau 'json' (JSON Lines)
+app.config['LOG_FILE'] = None  # Path log JSON Lines, contoh: 'metadata_checker.log'
+app.config['LOG_FILE_MAX_BYTES'] = 10 * 1024 * 1024  # Rotasi file log setelah ukuran ini
+app.config['LOG_FILE_BACKUPS'] = 3  # Jumlah file log lama yang disimpan (.1, .2, ...)
+app.config['LOG_SAMPLE'] = {}  # Simpan 1 dari N pesan per level, contoh: {'RUNNING': 10}
+app.config['LOG_QUEUE_SIZE'] = 10000  # Pesan yang boleh mengantri, kelebihannya dibuang (tidak pernah memblokir)
+app.config['METADATA_CACHE_SIZE'] = 256  # Jumlah hasil ekstraksi yang disimpan di memori (LRU)
+app.config['METADATA_CACHE_DB'] = None  # Path SQLite untuk cache di disk, contoh: 'metadata_cache.sqlite'
+app.config['SEARCH_INDEX_DB'] = os.path.join('uploads', '.index.sqlite')  # Index pencarian metadata (None = nonaktif)
+app.config['REMOTE_TIMEOUT'] = 15  # Detik timeout koneksi/baca untuk /api/analyze-url
+app.config['REMOTE_POOL_SIZE'] = 4  # Koneksi keep-alive idle yang disimpan per host
+app.config['REMOTE_FULL_FETCH'] = 8 * 1024 * 1024  # File remote sekecil ini di-download utuh dan disimpan sebagai upload
+app.config['REMOTE_HEAD_BYTES'] = 256 * 1024  # Byte awal yang diambil (header, EXIF)
+app.config['REMOTE_TAIL_BYTES'] = 64 * 1024  # Byte akhir yang diambil (trailer PDF, end of central directory zip)
+app.config['REMOTE_MAX_FETCH'] = 64 * 1024 * 1024  # Maksimal byte yang diambil dari satu file besar (moov, central directory)
+app.config['REMOTE_ALLOW_PRIVATE'] = False  # Izinkan URL ke localhost/jaringan privat (mis. MinIO lokal)
+app.config['S3_ENDPOINT'] = None  # Endpoint S3-compatible untuk URL s3://bucket/key, contoh: 'http://127.0.0.1:9000'
+app.config['S3_ACCESS_KEY'] = None  # Kosongkan untuk bucket publik (request tanpa signature)
+app.config['S3_SECRET_KEY'] = None
+app.config['S3_REGION'] = 'us-east-1'
+app.config['STORAGE_QUOTA'] = 2 * 1024 * 1024 * 1024  # Total ukuran upload, file yang paling lama tidak diakses dihapus (None = tanpa batas)
+app.config['UPLOAD_TTL'] = 24 * 3600  # Hapus upload yang tidak diakses selama sekian detik (None = tidak pernah)
+app.config['JANITOR_INTERVAL'] = 300  # Detik antar pembersihan folder upload di background
 
 # Create uploads folder if it doesn't exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+os.makedirs(app.config['OBJECT_FOLDER'], exist_ok=True)
+
+# Tools implemented in Python, always available
+BUILTIN_TOOLS = {
+    'zipinfo': 'builtin zip reader',
+    'strings': 'builtin scanner',
+}
+
+# Deadline for the extraction currently running on this worker thread
+_extraction_state = threading.local()
+
+# Where log_message writes; the scan command moves logs to stderr (or None to silence them)
+LOG_OUTPUT = sys.stdout
+
+LOG_LEVELS = {
+    'DEBUG': 10, 'CHECKING': 15, 'RUNNING': 15,
+    'INFO': 20, 'START': 20, 'SUCCESS': 20, 'WARNING': 30, 'ERROR': 40,
+}
+
+class AsyncLogger:
+    """Hands log records to a background writer thread so request threads never wait on I/O
+
+    Records below the level threshold or dropped by sampling are rejected before any
+    formatting. When the queue is full, records are dropped and counted instead of blocking.
+    """
+
+    def __init__(self, level, console_format='text', file_path=None, max_bytes=0, backups=0, sample=None,
+                 queue_size=10000):
+        self.threshold = LOG_LEVELS.get(level, 0)
+        self.console_format = console_format
+        self.file_path = file_path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.sample = {LOG_LEVELS.get(name, name): every for name, every in (sample or {}).items() if every > 1}
+        self.dropped = 0
+        self._seen = {}
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._file = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._last_second = None
+        self._last_timestamp = None
+
+    def enabled(self, level):
+        return LOG_LEVELS.get(level, 20) >= self.threshold
+
+    def log(self, level, tool, message, file_path=None):
+        severity = LOG_LEVELS.get(level, 20)
+        if severity < self.threshold or (LOG_OUTPUT is None and not self.file_path):
+            return
+        every = self.sample.get(severity)
+        if every:
+            # Unlocked on purpose: a race only shifts which records are kept
+            seen = self._seen.get(severity, 0)
+            self._seen[severity] = seen + 1
+            if seen % every:
+                return
+        if self._pid != os.getpid():
+            # First record, or first one in a forked scan worker where the writer thread does not exist
+            self._start()
+        try:
+            self._queue.put_nowait((time.time(), level, tool, message, file_path, threading.current_thread().name))
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+                self._file = None
+            self._pid = os.getpid()
+            threading.Thread(target=self._write_forever, name='log-writer', daemon=True).start()
 
-TOOLS_AVAILABLE = {}
+    def _write_forever(self):
+        while True:
+            records = [self._queue.get()]
+            # Drain whatever else is waiting so one flush covers the whole burst
+            while len(records) < 1000:
+                try:
+                    records.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(records)
+            except Exception as e:
+                print(f"Logging failed: {str(e)}", file=sys.stderr)
+            for _ in records:
+                self._queue.task_done()
+
+    def _write(self, records):
+        console = LOG_OUTPUT
+        lines = []
+        json_lines = []
+        for created, level, tool, message, file_path, thread in records:
+            record = None
+            if self.file_path or self.console_format == 'json':
+                record = json.dumps({
+                    "time": datetime.fromtimestamp(created).isoformat(timespec='milliseconds'),
+                    "level": level,
+                    "tool": tool.upper(),
+                    "message": message,
+                    "file": os.path.basename(file_path) if file_path else None,
+                    "thread": thread,
+                }, ensure_ascii=False)
+                json_lines.append(record)
+            if console is not None:
+                if self.console_format == 'json':
+                    lines.append(record)
+                else:
+                    file_info = f" - File: {os.path.basename(file_path)}" if file_path else ""
+                    lines.append(f"[{self._timestamp(created)}] [{level}] {tool.upper()}: {message}{file_info}")
+
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            lines.append(f"[{self._timestamp(time.time())}] [WARNING] LOGGING: Dropped {dropped} messages, queue full")
+        if console is not None and lines:
+            console.write("\n".join(lines) + "\n")
+            console.flush()
+        if self.file_path and json_lines:
+            self._write_file("\n".join(json_lines) + "\n")
+
+    def _timestamp(self, created):
+        # Many records share a second, format it once
+        second = int(created)
+        if second != self._last_second:
+            self._last_second = second
+            self._last_timestamp = datetime.fromtimestamp(second).strftime("%Y-%m-%d %H:%M:%S")
+        return self._last_timestamp
+
+    def _write_file(self, text):
+        if self._file is None:
+            self._file = open(self.file_path, 'a', encoding='utf-8')
+        self._file.write(text)
+        self._file.flush()
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            self._file.close()
+            self._file = None
+            for index in range(self.backups - 1, 0, -1):
+                if os.path.exists(f"{self.file_path}.{index}"):
+                    os.replace(f"{self.file_path}.{index}", f"{self.file_path}.{index + 1}")
+            if self.backups:
+                os.replace(self.file_path, f"{self.file_path}.1")
+            else:
+                os.remove(self.file_path)
+
+    def flush(self, timeout=5):
+        """Wait (briefly) until queued records are written, e.g. before exiting"""
+        if self._pid != os.getpid():
+            return
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+LOGGER = AsyncLogger(
+    app.config['LOG_LEVEL'], app.config['LOG_FORMAT'], app.config['LOG_FILE'],
+    app.config['LOG_FILE_MAX_BYTES'], app.config['LOG_FILE_BACKUPS'], app.config['LOG_SAMPLE'],
+    app.config['LOG_QUEUE_SIZE']
+)
+atexit.register(LOGGER.flush)
 
 def log_message(level, tool, message, file_path=None):
     """Log messages with timestamp and formatting"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    file_info = f" - File: {os.path.basename(file_path)}" if file_path else ""
-    print(f"[{timestamp}] [{level}] {tool.upper()}: {message}{file_info}")
+    LOGGER.log(level, tool, message, file_path)
+
+def tool_timeout():
+    """Seconds left before the current extraction deadline"""
+    deadline = getattr(_extraction_state, 'deadline', None)
+    if deadline is None:
+        return app.config['EXTRACTION_DEADLINE']
+    return max(0.1, deadline - time.monotonic())
+
+# Upper bounds (seconds) of the latency histogram buckets
+METRIC_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+class Metrics:
+    """Counters, histograms and gauges kept in memory and rendered as Prometheus text"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self._descriptions = {}
+        self._values = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name, kind, help_text):
+        self._descriptions[name] = (kind, help_text)
+        self._values.setdefault(name, {})
+
+    def inc(self, name, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            values = self._values[name]
+            values[key] = values.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            values = self._values[name]
+            if key not in values:
+                # Per-bucket counts, then sum and count
+                values[key] = [0] * len(self.buckets) + [0.0, 0]
+            histogram = values[key]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[i] += 1
+                    break
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def gauge(self, name, help_text, func, kind="gauge"):
+        """Register a value read from func when rendering, e.g. a queue length or an existing counter"""
+        self._descriptions[name] = (kind, help_text)
+        self._gauges[name] = func
+
+    def render(self):
+        lines = []
+        with self._lock:
+            values = {name: dict(series) for name, series in self._values.items()}
+        for name, (kind, help_text) in self._descriptions.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if name in self._gauges:
+                try:
+                    lines.append(f"{name} {float(self._gauges[name]())}")
+                except Exception as e:
+                    log_message("WARNING", "METRICS", f"Gauge {name} failed: {str(e)}")
+                continue
+            for key, value in values[name].items():
+                if kind == "counter":
+                    lines.append(f"{name}{_metric_labels(key)} {value}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(self.buckets, value):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_metric_labels(key + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_metric_labels(key + (('le', '+Inf'),))} {value[-1]}")
+                lines.append(f"{name}_sum{_metric_labels(key)} {value[-2]}")
+                lines.append(f"{name}_count{_metric_labels(key)} {value[-1]}")
+        return "\n".join(lines) + "\n"
+
+def _metric_labels(key):
+    """Render sorted label pairs as {name="value",...}"""
+    if not key:
+        return ""
+    pairs = []
+    for name, value in key:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+METRICS = Metrics(METRIC_BUCKETS)
+METRICS.describe("metadata_extractor_seconds", "histogram", "Wall time of one extractor run by tool and MIME type")
+METRICS.describe("metadata_extractor_stage_seconds", "histogram", "Time spent spawning, running and parsing external tools")
+METRICS.describe("metadata_extractor_runs_total", "counter", "Extractor runs by tool and outcome (ok, error, timeout)")
+METRICS.describe("metadata_extractor_input_bytes_total", "counter", "Size of the files given to each extractor")
+METRICS.describe("metadata_extractor_output_bytes_total", "counter", "Bytes of tool output read by each extractor")
+
+def record_stage(stage=None, seconds=0.0, output_bytes=0):
+    """Add process timings to the extractor currently running on this thread"""
+    stages = getattr(_extraction_state, 'stages', None)
+    if stages is None:
+        return
+    if stage:
+        stages[stage] = stages.get(stage, 0.0) + seconds
+    stages["output_bytes"] = stages.get("output_bytes", 0) + output_bytes
+
+def record_timeout():
+    """Mark the extractor running on this thread as stopped by its deadline
+
+    _run_extractor then counts the run once, with outcome "timeout" instead of "error".
+    """
+    stages = getattr(_extraction_state, 'stages', None)
+    if stages is not None:
+        stages["timed_out"] = True
+
+def record_extractor(name, mime_type, seconds, outcome, stages=None, input_bytes=0):
+    """Feed one extractor run into the metrics"""
+    mime_type = mime_type or "unknown"
+    METRICS.inc("metadata_extractor_runs_total", tool=name, outcome=outcome)
+    if outcome == "timeout":
+        return
+    METRICS.observe("metadata_extractor_seconds", seconds, tool=name, mime_type=mime_type)
+    METRICS.inc("metadata_extractor_input_bytes_total", input_bytes, tool=name)
+    if stages:
+        METRICS.inc("metadata_extractor_output_bytes_total", stages.get("output_bytes", 0), tool=name)
+        spent = 0.0
+        for stage in ("spawn", "run"):
+            if stage in stages:
+                METRICS.observe("metadata_extractor_stage_seconds", stages[stage], tool=name, stage=stage)
+                spent += stages[stage]
+        METRICS.observe("metadata_extractor_stage_seconds", max(0.0, seconds - spent), tool=name, stage="parse")
+
+class ProcessLimitError(Exception):
+    """A tool was killed for going over its output or CPU time limit"""
+
+# Kept from stderr; the rest is read and dropped so the tool never blocks on a full pipe
+STDERR_LIMIT = 64 * 1024
+
+# ioprio_set is not in the os module; syscall numbers per architecture
+IOPRIO_SET_SYSCALLS = {'x86_64': 251, 'i686': 289, 'aarch64': 30, 'armv7l': 314, 'armv8l': 314}
+IOPRIO_CLASS_BEST_EFFORT = 2
+
+try:
+    _libc = ctypes.CDLL(None, use_errno=True)
+except OSError:
+    _libc = None
+
+# Deadline kills are counted once, as metadata_extractor_runs_total{outcome="timeout"}
+METRICS.describe("metadata_process_killed_total", "counter", "Tool processes killed for going over a limit, by reason (output, cpu)")
+
+def limit_process(pid, cpu_seconds=None):
+    """Apply the PROCESS_* memory, CPU time and priority limits to a tool that was just started"""
+    try:
+        if resource is not None and hasattr(resource, 'prlimit'):
+            memory = app.config['PROCESS_MEMORY_LIMIT']
+            if memory:
+                resource.prlimit(pid, resource.RLIMIT_AS, (memory, memory))
+            if cpu_seconds:
+                # SIGXCPU at the soft limit, SIGKILL one second later
+                resource.prlimit(pid, resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+        if app.config['PROCESS_NICE'] and hasattr(os, 'setpriority'):
+            # Never below our own niceness, raising priority needs privileges
+            nice = max(app.config['PROCESS_NICE'], os.getpriority(os.PRIO_PROCESS, 0))
+            os.setpriority(os.PRIO_PROCESS, pid, nice)
+        syscall = IOPRIO_SET_SYSCALLS.get(platform.machine())
+        if app.config['PROCESS_IONICE'] is not None and syscall and _libc is not None:
+            # IOPRIO_WHO_PROCESS = 1, class in the top bits
+            _libc.syscall(syscall, 1, pid, (IOPRIO_CLASS_BEST_EFFORT << 13) | app.config['PROCESS_IONICE'])
+    except (OSError, ValueError) as e:
+        # Already exited, or limits not permitted here: run it unrestricted rather than fail
+        log_message("DEBUG", "PROCESS", f"Could not limit process {pid}: {str(e)}")
+
+def kill_process_group(process):
+    """Kill a tool started in its own session together with anything it spawned"""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError, AttributeError):
+        process.kill()
+    process.wait()
+
+def _read_bounded(process, args, timeout, max_output):
+    """Read stdout and stderr until both close, within timeout and max_output stdout bytes"""
+    deadline = time.monotonic() + timeout
+    stdout, stderr = bytearray(), bytearray()
+    buffers = {process.stdout.fileno(): stdout, process.stderr.fileno(): stderr}
+
+    with selectors.DefaultSelector() as selector:
+        for fd in buffers:
+            selector.register(fd, selectors.EVENT_READ)
+        while buffers:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                record_timeout()
+                raise subprocess.TimeoutExpired(args, timeout, bytes(stdout), bytes(stderr))
+
+            for key, _ in selector.select(remaining):
+                chunk = os.read(key.fd, 65536)
+                if not chunk:
+                    selector.unregister(key.fd)
+                    del buffers[key.fd]
+                    continue
+                buffer = buffers[key.fd]
+                if buffer is stderr:
+                    buffer += chunk[:max(0, STDERR_LIMIT - len(buffer))]
+                    continue
+                buffer += chunk
+                if len(buffer) > max_output:
+                    METRICS.inc("metadata_process_killed_total", reason="output")
+                    raise ProcessLimitError(f"{args[0]} output exceeded {format_size(max_output)}")
+    return bytes(stdout), bytes(stderr)
+
+def _wait_with_usage(process):
+    """Reap a finished tool: (returncode, CPU seconds it used, or None where wait4 is unavailable)"""
+    if not hasattr(os, 'wait4'):
+        return process.wait(), None
+    try:
+        _, status, usage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        # Already reaped by Popen
+        return process.wait(), None
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return process.returncode, usage.ru_utime + usage.ru_stime
+
+def run_process(args, timeout, check=True, text=True, max_output=None):
+    """Run a tool like subprocess.run with captured output, timing the spawn and run stages
+
+    The tool runs in its own session under the PROCESS_* limits. Its whole process group
+    is killed at the timeout or once stdout grows past max_output (PROCESS_OUTPUT_LIMIT).
+    """
+    max_output = max_output or app.config['PROCESS_OUTPUT_LIMIT']
+    started = time.monotonic()
+    process = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               start_new_session=True)
+    limit_process(process.pid, app.config['PROCESS_CPU_LIMIT'])
+    spawned = time.monotonic()
+    try:
+        stdout, stderr = _read_bounded(process, args, timeout, max_output)
+        returncode, cpu_time = _wait_with_usage(process)
+    except BaseException:
+        kill_process_group(process)
+        raise
+    finally:
+        process.stdout.close()
+        process.stderr.close()
+        record_stage("spawn", spawned - started)
+    record_stage("run", time.monotonic() - spawned, len(stdout))
+
+    cpu_limit = app.config['PROCESS_CPU_LIMIT']
+    # SIGKILL also comes from the OOM killer or an operator, only blame the limit when it was used up
+    if cpu_limit and (returncode == -signal.SIGXCPU or
+                      returncode == -signal.SIGKILL and cpu_time is not None and cpu_time >= cpu_limit):
+        METRICS.inc("metadata_process_killed_total", reason="cpu")
+        raise ProcessLimitError(f"{args[0]} went over its {app.config['PROCESS_CPU_LIMIT']}s CPU time limit")
+    if text:
+        stdout = stdout.decode('utf-8', errors='replace')
+        stderr = stderr.decode('utf-8', errors='replace')
+    if check and returncode:
+        raise subprocess.CalledProcessError(returncode, args, stdout, stderr)
+    return subprocess.CompletedProcess(args, returncode, stdout, stderr)
+
+# Command that prints each external tool's version
+TOOL_COMMANDS = {
+    'exiftool': ['exiftool', '-ver'],
+    'mediainfo': ['mediainfo', '--version'],
+    'ffprobe': ['ffprobe', '-version'],
+    'identify': ['identify', '-version'],
+    'file': ['file', '--version'],
+}
+
+class ToolRegistry:
+    """Availability, version and path of every tool, probed concurrently and refreshed in the background"""
+
+    def __init__(self, commands, builtins):
+        self.commands = commands
+        self.builtins = builtins
+        self.names = list(commands) + list(builtins)
+        self._tools = {}
+        self._signature = None
+        self._lock = threading.Lock()
+        self._probe_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def probe(self):
+        """Check all tools at once, replacing the previous results"""
+        with self._probe_lock:
+            return self._probe()
+
+    def _probe(self):
+        with ThreadPoolExecutor(max_workers=len(self.commands), thread_name_prefix='probe') as pool:
+            results = dict(zip(self.commands, pool.map(self._probe_tool, self.commands)))
+        for name, version in self.builtins.items():
+            results[name] = {"available": True, "version": version, "path": None}
+
+        with self._lock:
+            changed = [name for name in results if name in self._tools and self._tools[name] != results[name]]
+            self._tools = results
+            self._signature = None
+        for name in changed:
+            log_message("INFO", name, f"Tool changed: {results[name]['version'] or 'not available'}")
+        return results
+
+    def _probe_tool(self, tool_name):
+        try:
+            log_message("CHECKING", tool_name, "Checking if tool is available")
+            command = self.commands[tool_name]
+            result = subprocess.run(command, capture_output=True, check=True, timeout=5)
+            version_lines = result.stdout.decode('utf-8', errors='replace').strip().splitlines()
+            log_message("SUCCESS", tool_name, "Tool is available")
+            return {
+                "available": True,
+                "version": version_lines[0].strip() if version_lines else "unknown",
+                "path": shutil.which(command[0]),
+            }
+        except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired) as e:
+            log_message("ERROR", tool_name, f"Tool not available: {str(e)}")
+            return {"available": False, "version": None, "path": None}
+
+    def _snapshot(self):
+        with self._lock:
+            tools = self._tools
+        if tools:
+            return tools
+        # Nothing probed yet (e.g. imported by another program): probe once, all tools together
+        with self._probe_lock:
+            with self._lock:
+                tools = self._tools
+            return tools or self._probe()
+
+    def available(self, tool_name):
+        return self._snapshot().get(tool_name, {}).get("available", False)
+
+    def status(self):
+        """{tool: available} for every tool, in display order"""
+        tools = self._snapshot()
+        return {name: tools[name]["available"] for name in self.names}
+
+    def info(self):
+        """{tool: {available, version, path}} for every tool"""
+        tools = self._snapshot()
+        return {name: dict(tools[name]) for name in self.names}
+
+    def signature(self):
+        """Short hash of tool versions, changes whenever a re-probe finds a different version"""
+        tools = self._snapshot()
+        with self._lock:
+            if self._signature is None:
+                versions = json.dumps(sorted((name, tool["version"]) for name, tool in tools.items()))
+                self._signature = hashlib.sha1(versions.encode('utf-8')).hexdigest()[:12]
+            return self._signature
+
+    def start_refresh(self, interval, sighup=True):
+        """Re-probe every interval seconds and, with sighup, on SIGHUP"""
+        if interval:
+            threading.Thread(target=self._refresh, args=(interval,), name='tool-probe', daemon=True).start()
+        if sighup and hasattr(signal, 'SIGHUP') and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGHUP, lambda signum, frame: threading.Thread(
+                target=self.probe, name='tool-probe-sighup', daemon=True).start())
+
+    def _refresh(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.probe()
+            except Exception as e:
+                log_message("ERROR", "TOOLS", f"Tool re-probe failed: {str(e)}")
+
+TOOL_REGISTRY = ToolRegistry(TOOL_COMMANDS, BUILTIN_TOOLS)
 
 def check_tool(tool_name):
     """Check if a tool is installed - Termux compatible"""
-    if tool_name in TOOLS_AVAILABLE:
-        return TOOLS_AVAILABLE[tool_name]
+    return TOOL_REGISTRY.available(tool_name)
 
-    try:
-        log_message("CHECKING", tool_name, "Checking if tool is available")
-        
-        if tool_name == 'exiftool':
-            subprocess.run(['exiftool', '-ver'], capture_output=True, check=True, timeout=5)
-        elif tool_name == 'mediainfo':
-            subprocess.run(['mediainfo', '--version'], capture_output=True, check=True, timeout=5)
-        elif tool_name == 'ffprobe':
-            subprocess.run(['ffprobe', '-version'], capture_output=True, check=True, timeout=5)
-        elif tool_name == 'identify':
-            subprocess.run(['identify', '-version'], capture_output=True, check=True, timeout=5)
-        elif tool_name == 'file':
-            subprocess.run(['file', '--version'], capture_output=True, check=True, timeout=5)
-        elif tool_name == 'zipinfo':
-            subprocess.run(['unzip', '-v'], capture_output=True, check=True, timeout=5)
-        elif tool_name == 'strings':
-            subprocess.run(['strings', '--version'], capture_output=True, check=True, timeout=5)
-        
-        TOOLS_AVAILABLE[tool_name] = True
-        log_message("SUCCESS", tool_name, "Tool is available")
-        return True
-    except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired) as e:
-        TOOLS_AVAILABLE[tool_name] = False
-        log_message("ERROR", tool_name, f"Tool not available: {str(e)}")
-        return False
+class ExifToolError(Exception):
+    """Raised when a stay_open exiftool process dies or stops responding"""
+
+class ExifToolProcess:
+    """A long-running `exiftool -stay_open True -@ -` worker"""
+
+    def __init__(self):
+        self.process = subprocess.Popen(
+            ['exiftool', '-stay_open', 'True', '-@', '-'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True
+        )
+        # No CPU time limit, it would add up over every request this worker serves
+        limit_process(self.process.pid)
+        self.requests = 0
+        self.last_used = time.monotonic()
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def execute(self, args, timeout):
+        """Send one command and return (stdout, stderr, returncode) once exiftool reports it is ready
+
+        returncode is None with an exiftool too old to report ${status}.
+        """
+        self.requests += 1
+        self.last_used = time.monotonic()
+        marker = f"{{ready{self.requests}}}"
+
+        # One argument per line; -echo4 puts the command's exit status and the same marker on stderr
+        lines = list(args) + ['-echo4', '${status}' + marker, f'-execute{self.requests}']
+        try:
+            self.process.stdin.write(('\n'.join(lines) + '\n').encode('utf-8'))
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise ExifToolError(f"exiftool process is gone: {str(e)}")
+
+        stdout, stderr = self._read_response(marker.encode(), timeout)
+        stderr, _, status = stderr.rpartition('\n') if '\n' in stderr else ('', '', stderr)
+        return stdout, stderr, int(status) if status.isdigit() else None
+
+    def _read_response(self, marker, timeout):
+        deadline = time.monotonic() + timeout
+        streams = {self.process.stdout.fileno(): bytearray(), self.process.stderr.fileno(): bytearray()}
+        pending = set(streams)
+
+        with selectors.DefaultSelector() as selector:
+            for fd in pending:
+                selector.register(fd, selectors.EVENT_READ)
+
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    record_timeout()
+                    raise subprocess.TimeoutExpired('exiftool', timeout)
+
+                for key, _ in selector.select(remaining):
+                    chunk = os.read(key.fd, 65536)
+                    if not chunk:
+                        raise ExifToolError("exiftool exited while processing a request")
+
+                    buffer = streams[key.fd]
+                    buffer += chunk
+                    if len(buffer) > app.config['PROCESS_OUTPUT_LIMIT']:
+                        METRICS.inc("metadata_process_killed_total", reason="output")
+                        raise ExifToolError(f"exiftool output exceeded {format_size(app.config['PROCESS_OUTPUT_LIMIT'])}")
+                    # Only the tail can hold the marker, don't copy the whole buffer on every read
+                    if buffer[-(len(marker) + 64):].rstrip().endswith(marker):
+                        pending.discard(key.fd)
+                        selector.unregister(key.fd)
+
+        stdout, stderr = (
+            bytes(buffer).rstrip()[:-len(marker)].decode('utf-8', errors='replace')
+            for buffer in streams.values()
+        )
+        return stdout, stderr
+
+    def close(self, force=False):
+        """Ask exiftool to exit, killing it if it does not or when forced"""
+        if not force:
+            try:
+                self.process.stdin.write(b'-stay_open\nFalse\n')
+                self.process.stdin.flush()
+                self.process.wait(timeout=5)
+                return
+            except Exception:
+                pass
+        kill_process_group(self.process)
+
+class ExifToolPool:
+    """Bounded pool of stay_open exiftool workers shared by all requests"""
+
+    def __init__(self, size):
+        self.size = size
+        self._idle = []
+        # Notified whenever a worker is returned or a slot is freed, so a waiter can take or create one
+        self._available = threading.Condition()
+        self._created = 0
+
+    def _acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        with self._available:
+            while not self._idle and self._created >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired('exiftool', timeout)
+                self._available.wait(remaining)
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+
+        try:
+            log_message("INFO", "EXIFTOOL", "Starting stay_open worker")
+            return ExifToolProcess()
+        except Exception:
+            self._free_slot()
+            raise
+
+    def _release(self, worker):
+        with self._available:
+            self._idle.append(worker)
+            self._available.notify()
+
+    def _free_slot(self):
+        with self._available:
+            self._created -= 1
+            self._available.notify()
+
+    def _discard(self, worker, force=False):
+        worker.close(force)
+        self._free_slot()
+
+    def _healthy(self, worker):
+        """Check that a worker is still running and answering before reusing it"""
+        if not worker.alive() or worker.requests >= app.config['EXIFTOOL_MAX_REQUESTS']:
+            return False
+        if time.monotonic() - worker.last_used < app.config['EXIFTOOL_HEALTH_INTERVAL']:
+            return True
+        try:
+            return bool(worker.execute(['-ver'], 5)[0].strip())
+        except (ExifToolError, subprocess.TimeoutExpired):
+            return False
+
+    def execute(self, args, timeout):
+        """Run one exiftool command on a pooled worker, restarting it on crash or hang"""
+        deadline = time.monotonic() + timeout
+        worker = self._acquire(timeout)
+        restarts = 0
+        while not self._healthy(worker):
+            log_message("WARNING", "EXIFTOOL", "Restarting unhealthy stay_open worker")
+            self._discard(worker, force=True)
+            restarts += 1
+            if restarts > 2:
+                raise ExifToolError("exiftool workers keep failing health checks")
+            worker = self._acquire(max(0.1, deadline - time.monotonic()))
+
+        try:
+            output = worker.execute(args, max(0.1, deadline - time.monotonic()))
+        except (ExifToolError, subprocess.TimeoutExpired) as e:
+            log_message("ERROR", "EXIFTOOL", f"stay_open worker failed, restarting: {str(e)}")
+            self._discard(worker, force=True)
+            raise
+        self._release(worker)
+        return output
+
+    def close(self):
+        with self._available:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            self._discard(worker)
+
+EXIFTOOL_POOL = ExifToolPool(app.config['EXIFTOOL_POOL_SIZE'])
+atexit.register(EXIFTOOL_POOL.close)
+
+def run_exiftool(args, check=False, timeout=None):
+    """Run exiftool with the given arguments, through the stay_open pool when possible"""
+    timeout = timeout or tool_timeout()
+    # The argfile is line based and exiftool strips whitespace around each line
+    use_pool = (
+        EXIFTOOL_POOL.size > 0
+        and os.name != 'nt'
+        and all(arg == arg.strip() and '\n' not in arg and '\r' not in arg for arg in args)
+    )
+    if not use_pool:
+        return run_process(['exiftool'] + args, timeout=timeout, check=check)
+
+    started = time.monotonic()
+    stdout, stderr, returncode = EXIFTOOL_POOL.execute(args, timeout)
+    record_stage("run", time.monotonic() - started, len(stdout))
+    if returncode is None:
+        # No ${status} support, exiftool reports failures as "Error: ..." lines
+        returncode = 1 if any(line.startswith('Error') for line in stderr.splitlines()) else 0
+    if check and returncode:
+        raise subprocess.CalledProcessError(returncode, ['exiftool'] + args, stdout, stderr)
+    return subprocess.CompletedProcess(['exiftool'] + args, returncode, stdout, stderr)
 
 def get_exiftool_metadata(file_path):
     """Extract metadata using exiftool"""
@@ -68,10 +859,7 @@ def get_exiftool_metadata(file_path):
     try:
         log_message("RUNNING", "EXIFTOOL", "Extracting metadata", file_path)
         
-        result = subprocess.run(
-            ['exiftool', '-json', file_path],
-            capture_output=True, text=True, check=True, timeout=30
-        )
+        result = run_exiftool(['-json', file_path], check=True)
         
         if result.stdout.strip():
             metadata = json.loads(result.stdout)[0]
@@ -84,17 +872,85 @@ def get_exiftool_metadata(file_path):
         log_message("ERROR", "EXIFTOOL", f"Failed to extract metadata: {str(e)}", file_path)
         return {"error": str(e)}
 
-def get_mediainfo_metadata(file_path):
-    """Extract metadata using mediainfo"""
+def chunk_files(file_paths, max_files=None, max_bytes=None):
+    """Group paths into lists bounded by file count and total size"""
+    max_files = max_files or app.config['EXIFTOOL_BATCH_FILES']
+    max_bytes = max_bytes or app.config['EXIFTOOL_BATCH_BYTES']
+    chunk, chunk_bytes = [], 0
+    for file_path in file_paths:
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            size = 0
+        if chunk and (len(chunk) >= max_files or chunk_bytes + size > max_bytes):
+            yield chunk
+            chunk, chunk_bytes = [], 0
+        chunk.append(file_path)
+        chunk_bytes += size
+    if chunk:
+        yield chunk
+
+def exiftool_file_errors(stderr, by_source, prefix=''):
+    """{path: message} for exiftool stderr lines of the form "<message> - <file>" """
+    errors = {}
+    for line in stderr.splitlines():
+        message, _, source = line.rpartition(' - ')
+        if message and message.startswith(prefix) and os.path.normpath(source) in by_source:
+            errors[by_source[os.path.normpath(source)]] = message
+    return errors
+
+def get_exiftool_metadata_batch(file_paths):
+    """Extract metadata for many files with one exiftool command per chunk
+
+    Returns {path: metadata} with the same shape get_exiftool_metadata gives for one file.
+    """
+    if not check_tool('exiftool'):
+        return {file_path: {"error": "exiftool not installed"} for file_path in file_paths}
+
+    results = {}
+    for chunk in chunk_files(file_paths):
+        log_message("RUNNING", "EXIFTOOL", f"Extracting metadata for {len(chunk)} files in one batch")
+        # exiftool reports SourceFile with forward slashes, match on normalized paths
+        by_source = {os.path.normpath(file_path): file_path for file_path in chunk}
+        timeout = app.config['EXTRACTION_DEADLINE'] + sum(
+            estimate_cost('exiftool', os.path.getsize(file_path)) for file_path in chunk if os.path.exists(file_path)
+        )
+
+        try:
+            result = run_exiftool(['-json'] + chunk, timeout=timeout)
+            for metadata in json.loads(result.stdout) if result.stdout.strip() else []:
+                file_path = by_source.get(os.path.normpath(metadata.get("SourceFile", "")))
+                if file_path:
+                    results[file_path] = metadata
+
+            errors = exiftool_file_errors(result.stderr, by_source)
+            for file_path in chunk:
+                if file_path not in results:
+                    results[file_path] = {"error": errors.get(file_path, "No metadata found")}
+            log_message("SUCCESS", "EXIFTOOL", f"Batch extracted {len(chunk) - len(errors)}/{len(chunk)} files")
+        except Exception as e:
+            log_message("ERROR", "EXIFTOOL", f"Batch extraction failed: {str(e)}")
+            for file_path in chunk:
+                results[file_path] = {"error": str(e)}
+    return results
+
+def get_mediainfo_metadata(file_path, deep=False):
+    """Extract metadata using mediainfo
+
+    Parses only the headers (MEDIAINFO_PARSE_SPEED) unless deep is set.
+    """
     if not check_tool('mediainfo'):
         return {"error": "mediainfo not installed"}
 
     try:
         log_message("RUNNING", "MEDIAINFO", "Extracting media information", file_path)
         
-        result = subprocess.run(
-            ['mediainfo', '--Output=JSON', file_path],
-            capture_output=True, text=True, check=True, timeout=30
+        args = ['mediainfo', '--Output=JSON']
+        if not deep:
+            args.append(f"--ParseSpeed={app.config['MEDIAINFO_PARSE_SPEED']}")
+        result = run_process(
+            args + [file_path],
+            timeout=tool_timeout()
         )
         
         if result.stdout.strip():
@@ -108,17 +964,28 @@ def get_mediainfo_metadata(file_path):
         log_message("ERROR", "MEDIAINFO", f"Failed to extract media information: {str(e)}", file_path)
         return {"error": str(e)}
 
-def get_ffprobe_metadata(file_path):
-    """Extract metadata using ffprobe"""
+def get_ffprobe_metadata(file_path, deep=False):
+    """Extract metadata using ffprobe
+
+    Reads at most FFPROBE_PROBESIZE bytes and FFPROBE_ANALYZEDURATION seconds of
+    packets to detect streams unless deep is set. Container headers are still read
+    wherever they are, e.g. a moov atom at the end of an MP4.
+    """
     if not check_tool('ffprobe'):
         return {"error": "ffprobe not installed"}
 
     try:
         log_message("RUNNING", "FFPROBE", "Extracting audio/video information", file_path)
         
-        result = subprocess.run(
-            ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_format', '-show_streams', file_path],
-            capture_output=True, text=True, check=True, timeout=30
+        args = ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_format', '-show_streams']
+        if not deep:
+            args += [
+                '-probesize', str(app.config['FFPROBE_PROBESIZE']),
+                '-analyzeduration', str(int(app.config['FFPROBE_ANALYZEDURATION'] * 1000000)),
+            ]
+        result = run_process(
+            args + [file_path],
+            timeout=tool_timeout()
         )
         
         if result.stdout.strip():
@@ -132,22 +999,156 @@ def get_ffprobe_metadata(file_path):
         log_message("ERROR", "FFPROBE", f"Failed to extract audio/video information: {str(e)}", file_path)
         return {"error": str(e)}
 
+def _media_number(value, integer=False):
+    """Float (or int) from tool output such as "48000", "12.5" or "30000/1001"; None if absent"""
+    if value in (None, "", "N/A"):
+        return None
+    try:
+        if isinstance(value, str) and '/' in value:
+            numerator, denominator = value.split('/', 1)
+            number = float(numerator) / float(denominator) if float(denominator) else None
+        else:
+            number = float(value)
+    except (TypeError, ValueError):
+        return None
+    if number is None:
+        return None
+    return int(number) if integer else round(number, 3)
+
+def normalize_ffprobe(metadata):
+    """ffprobe -show_format -show_streams output in the shared media layout"""
+    container = metadata.get("format", {})
+    streams = []
+    for stream in metadata.get("streams", []):
+        streams.append({
+            "type": stream.get("codec_type"),
+            "codec": stream.get("codec_name"),
+            "width": _media_number(stream.get("width"), integer=True),
+            "height": _media_number(stream.get("height"), integer=True),
+            "frame_rate": _media_number(stream.get("avg_frame_rate")) or _media_number(stream.get("r_frame_rate")),
+            "sample_rate": _media_number(stream.get("sample_rate"), integer=True),
+            "channels": _media_number(stream.get("channels"), integer=True),
+            "bit_rate": _media_number(stream.get("bit_rate"), integer=True),
+            "duration": _media_number(stream.get("duration")),
+            "language": stream.get("tags", {}).get("language"),
+        })
+    return {
+        "format": container.get("format_long_name") or container.get("format_name"),
+        "duration": _media_number(container.get("duration")),
+        "bit_rate": _media_number(container.get("bit_rate"), integer=True),
+        "streams": streams,
+    }
+
+# mediainfo track @type -> ffprobe codec_type
+MEDIAINFO_TRACK_TYPES = {"Video": "video", "Audio": "audio", "Text": "subtitle", "Image": "video"}
+
+def normalize_mediainfo(metadata):
+    """mediainfo --Output=JSON output in the shared media layout"""
+    tracks = metadata.get("media", {}).get("track", []) if isinstance(metadata.get("media"), dict) else []
+    general = next((track for track in tracks if track.get("@type") == "General"), {})
+    streams = []
+    for track in tracks:
+        if track.get("@type") == "General":
+            continue
+        streams.append({
+            "type": MEDIAINFO_TRACK_TYPES.get(track.get("@type"), "data"),
+            "codec": track.get("Format"),
+            "width": _media_number(track.get("Width"), integer=True),
+            "height": _media_number(track.get("Height"), integer=True),
+            "frame_rate": _media_number(track.get("FrameRate")),
+            "sample_rate": _media_number(track.get("SamplingRate"), integer=True),
+            "channels": _media_number(track.get("Channels"), integer=True),
+            "bit_rate": _media_number(track.get("BitRate"), integer=True),
+            "duration": _media_number(track.get("Duration")),
+            "language": track.get("Language"),
+        })
+    return {
+        "format": general.get("Format"),
+        "duration": _media_number(general.get("Duration")),
+        "bit_rate": _media_number(general.get("OverallBitRate"), integer=True),
+        "streams": streams,
+    }
+
+MEDIA_NORMALIZERS = {
+    "ffprobe": normalize_ffprobe,
+    "mediainfo": normalize_mediainfo,
+}
+
+def merge_media(results):
+    """One media section from ffprobe and mediainfo results, earlier tools in MEDIA_NORMALIZERS winning"""
+    media = {"format": None, "duration": None, "bit_rate": None, "streams": [], "sources": []}
+    for name, normalize in MEDIA_NORMALIZERS.items():
+        result = results.get(name)
+        if not isinstance(result, dict) or "error" in result:
+            continue
+        normalized = normalize(result)
+        media["sources"].append(name)
+        for key in ("format", "duration", "bit_rate"):
+            if media[key] is None:
+                media[key] = normalized[key]
+        if not media["streams"]:
+            media["streams"] = normalized["streams"]
+            continue
+        # Fill gaps stream by stream, matching the nth stream of each type
+        for kind in {stream["type"] for stream in normalized["streams"]}:
+            ours = [stream for stream in media["streams"] if stream["type"] == kind]
+            theirs = [stream for stream in normalized["streams"] if stream["type"] == kind]
+            for stream, other in zip(ours, theirs):
+                for key, value in other.items():
+                    if stream.get(key) is None:
+                        stream[key] = value
+            # Streams the earlier tool did not see at all (e.g. beyond its probe size)
+            media["streams"].extend(theirs[len(ours):])
+    return media
+
+def media_fields_missing(media, fields):
+    """Names in fields ("duration", "video.width", ...) that the media section does not answer"""
+    missing = []
+    for field in fields:
+        kind, _, key = field.rpartition('.')
+        if not kind:
+            if media.get(key) in (None, "", []):
+                missing.append(field)
+        elif any(stream.get(key) is None for stream in media["streams"] if stream["type"] == kind):
+            missing.append(field)
+    return missing
+
+def ffprobe_answers_media(result):
+    """True when ffprobe alone already gives every MEDIA_FIELDS value"""
+    return not media_fields_missing(merge_media({"ffprobe": result}), app.config['MEDIA_FIELDS'])
+
 def get_pdf_metadata(file_path):
     """Extract PDF metadata using exiftool (fallback since pdfinfo not available)"""
     log_message("INFO", "PDF", "Using exiftool for PDF metadata extraction", file_path)
     return get_exiftool_metadata(file_path)
 
-def get_identify_metadata(file_path):
-    """Extract metadata using ImageMagick identify"""
+# Properties identify can report from the image header alone (-ping), one line per frame
+IDENTIFY_FIELDS = [
+    ("format", "%m"), ("width", "%w"), ("height", "%h"), ("depth", "%z"),
+    ("colorspace", "%[colorspace]"), ("compression", "%C"), ("quality", "%Q"),
+    ("resolution", "%xx%y"), ("units", "%U"), ("orientation", "%[orientation]"),
+    ("alpha", "%A"), ("profiles", "%[profiles]"),
+]
+IDENTIFY_FORMAT = "\x1f".join(spec for _, spec in IDENTIFY_FIELDS) + "\x1e"
+
+def get_identify_metadata(file_path, deep=False):
+    """Extract metadata using ImageMagick identify
+
+    The default asks only for header properties without decoding pixels. deep runs
+    identify -verbose, which also computes histograms and channel statistics.
+    """
     if not check_tool('identify'):
         return {"error": "identify not installed"}
 
     try:
+        if not deep:
+            return _identify_fast(file_path)
+
         log_message("RUNNING", "IDENTIFY", "Extracting image information", file_path)
         
-        result = subprocess.run(
+        result = run_process(
             ['identify', '-verbose', file_path],
-            capture_output=True, text=True, check=True, timeout=30
+            timeout=tool_timeout()
         )
         
         metadata = {}
@@ -175,28 +1176,174 @@ def get_identify_metadata(file_path):
         log_message("ERROR", "IDENTIFY", f"Failed to extract image information: {str(e)}", file_path)
         return {"error": str(e)}
 
+def _identify_fast(file_path):
+    """Header properties of every frame via identify -ping -format"""
+    log_message("RUNNING", "IDENTIFY", "Reading image properties", file_path)
+    result = run_process(
+        ['identify', '-ping', '-format', IDENTIFY_FORMAT, file_path],
+        timeout=tool_timeout()
+    )
+
+    frames = []
+    for record in result.stdout.split('\x1e'):
+        values = record.strip('\n').split('\x1f')
+        if len(values) != len(IDENTIFY_FIELDS):
+            continue
+        frame = {}
+        for (name, _), value in zip(IDENTIFY_FIELDS, values):
+            value = value.strip()
+            if name in ("width", "height", "depth", "quality"):
+                frame[name] = int(value) if value.isdigit() else None
+            elif name == "alpha":
+                frame[name] = value.lower() in ("true", "blend")
+            elif name == "profiles":
+                frame[name] = [profile for profile in value.split(',') if profile]
+            else:
+                frame[name] = value or None
+        frames.append(frame)
+
+    if not frames:
+        log_message("WARNING", "IDENTIFY", "No image information found", file_path)
+        return {"error": "No image information found"}
+
+    metadata = dict(frames[0], mode="fast", frames=len(frames))
+    log_message("SUCCESS", "IDENTIFY", f"Image is {metadata['width']}x{metadata['height']} {metadata['format']}", file_path)
+    return metadata
+
+# (offset, magic bytes, mime type, description, category), first match wins
+MAGIC_SIGNATURES = [
+    (0, b'\xff\xd8\xff', "image/jpeg", "JPEG image data", "image"),
+    (0, b'\x89PNG\r\n\x1a\n', "image/png", "PNG image data", "image"),
+    (0, b'GIF87a', "image/gif", "GIF image data", "image"),
+    (0, b'GIF89a', "image/gif", "GIF image data", "image"),
+    (0, b'II*\x00', "image/tiff", "TIFF image data, little-endian", "image"),
+    (0, b'MM\x00*', "image/tiff", "TIFF image data, big-endian", "image"),
+    (0, b'8BPS', "image/vnd.adobe.photoshop", "Adobe Photoshop Image", "image"),
+    (0, b'\x00\x00\x01\x00', "image/vnd.microsoft.icon", "MS Windows icon resource", "image"),
+    (0, b'BM', "image/bmp", "PC bitmap", "image"),
+    (0, b'%PDF-', "application/pdf", "PDF document", "pdf"),
+    (0, b'PK\x03\x04', "application/zip", "Zip archive data", "archive"),
+    (0, b'PK\x05\x06', "application/zip", "Zip archive data (empty)", "archive"),
+    (0, b'PK\x07\x08', "application/zip", "Zip archive data (spanned)", "archive"),
+    (0, b'\x1f\x8b', "application/gzip", "gzip compressed data", "compressed"),
+    (0, b'7z\xbc\xaf\x27\x1c', "application/x-7z-compressed", "7-zip archive data", "compressed"),
+    (0, b'Rar!\x1a\x07', "application/x-rar", "RAR archive data", "compressed"),
+    (0, b'BZh', "application/x-bzip2", "bzip2 compressed data", "compressed"),
+    (0, b'\xfd7zXZ\x00', "application/x-xz", "XZ compressed data", "compressed"),
+    (0, b'\x1aE\xdf\xa3', "video/x-matroska", "Matroska/WebM data", "video"),
+    (0, b'FLV', "video/x-flv", "Macromedia Flash Video", "video"),
+    (0, b'\x30\x26\xb2\x75\x8e\x66\xcf\x11', "video/x-ms-asf", "Microsoft ASF", "video"),
+    (0, b'\x00\x00\x01\xba', "video/mpeg", "MPEG sequence", "video"),
+    (0, b'ID3', "audio/mpeg", "Audio file with ID3 version 2", "audio"),
+    (0, b'\xff\xfb', "audio/mpeg", "MPEG ADTS, layer III", "audio"),
+    (0, b'\xff\xf3', "audio/mpeg", "MPEG ADTS, layer III", "audio"),
+    (0, b'\xff\xf2', "audio/mpeg", "MPEG ADTS, layer III", "audio"),
+    (0, b'\xff\xf1', "audio/aac", "MPEG ADTS, AAC", "audio"),
+    (0, b'\xff\xf9', "audio/aac", "MPEG ADTS, AAC", "audio"),
+    (0, b'fLaC', "audio/flac", "FLAC audio bitstream data", "audio"),
+    (0, b'OggS', "audio/ogg", "Ogg data", "audio"),
+    (0, b'MThd', "audio/midi", "Standard MIDI data", "audio"),
+    (0, b'\x7fELF', "application/x-executable", "ELF executable", "executable"),
+    (0, b'MZ', "application/x-dosexec", "MS-DOS/PE executable", "executable"),
+    (0, b'\xcf\xfa\xed\xfe', "application/x-mach-binary", "Mach-O 64-bit executable", "executable"),
+    (0, b'\xca\xfe\xba\xbe', "application/x-mach-binary", "Mach-O universal binary", "executable"),
+    (0, b'SQLite format 3\x00', "application/vnd.sqlite3", "SQLite 3.x database", "binary"),
+]
+
+# ISO base media "ftyp" brands -> (mime type, description, category)
+FTYP_BRANDS = {
+    b'heic': ("image/heic", "HEIF image (HEVC)", "image"),
+    b'heix': ("image/heic", "HEIF image (HEVC)", "image"),
+    b'mif1': ("image/heif", "HEIF image", "image"),
+    b'avif': ("image/avif", "AVIF image", "image"),
+    b'qt  ': ("video/quicktime", "Apple QuickTime movie", "video"),
+    b'M4A ': ("audio/mp4", "MPEG v4 audio (M4A)", "audio"),
+    b'3gp4': ("video/3gpp", "3GPP multimedia file", "video"),
+    b'3gp5': ("video/3gpp", "3GPP multimedia file", "video"),
+}
+
+# RIFF form types at offset 8 -> (mime type, description, category)
+RIFF_FORMS = {
+    b'WAVE': ("audio/x-wav", "RIFF (little-endian) data, WAVE audio", "audio"),
+    b'AVI ': ("video/x-msvideo", "RIFF (little-endian) data, AVI", "video"),
+    b'WEBP': ("image/webp", "RIFF (little-endian) data, Web/P image", "image"),
+}
+
+# IFF form types at offset 8 -> (mime type, description, category)
+IFF_FORMS = {
+    b'AIFF': ("audio/x-aiff", "IFF data, AIFF audio", "audio"),
+    b'AIFC': ("audio/x-aiff", "IFF data, AIFF-C compressed audio", "audio"),
+}
+
+# Top-level atoms that start QuickTime movies written without an ftyp box
+QUICKTIME_ATOMS = {b'moov', b'mdat', b'wide', b'free', b'skip', b'pnot'}
+
+# Bytes that may appear in text files, anything else marks the file as binary
+TEXT_BYTES = bytes({7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x100)) - {0x7f})
+
+def sniff_file_type(file_path):
+    """Identify the file type from its leading magic bytes, without spawning a process"""
+    with open(file_path, 'rb') as f:
+        head = f.read(4096)
+
+    def found(mime_type, description, category):
+        return {"mime_type": mime_type, "description": description, "category": category}
+
+    if head[4:8] == b'ftyp':
+        return found(*FTYP_BRANDS.get(head[8:12], ("video/mp4", "ISO Media, MP4", "video")))
+    if head[:4] == b'RIFF' and head[8:12] in RIFF_FORMS:
+        return found(*RIFF_FORMS[head[8:12]])
+    if head[:4] == b'FORM' and head[8:12] in IFF_FORMS:
+        return found(*IFF_FORMS[head[8:12]])
+    if head[4:8] in QUICKTIME_ATOMS:
+        return found("video/quicktime", "Apple QuickTime movie", "video")
+    if len(head) > 188 and head[0] == 0x47 and head[188] == 0x47:
+        return found("video/mp2t", "MPEG transport stream data", "video")
+
+    for offset, magic, mime_type, description, category in MAGIC_SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            return found(mime_type, description, category)
+
+    if not head:
+        return found("inode/x-empty", "empty", "empty")
+    if not head.translate(None, TEXT_BYTES):
+        if b'<svg' in head:
+            return found("image/svg+xml", "SVG Scalable Vector Graphics image", "image")
+        return found("text/plain", "text", "text")
+    # Not positively identified: routing sends it to every extractor
+    return found("application/octet-stream", "data", "unknown")
+
+# Sniffed categories that are a guess rather than a signature match; file(1) can tell more
+FILE_COMMAND_CATEGORIES = {"unknown", "text"}
+
 def get_file_type_metadata(file_path):
-    """Extract metadata using file command"""
+    """Identify the file type from its magic bytes, asking the file command only when they are not enough"""
+    sniffed = sniff_file_type(file_path)
+    if sniffed["category"] not in FILE_COMMAND_CATEGORIES:
+        log_message("SUCCESS", "FILE", f"File type identified: {sniffed['mime_type']}", file_path)
+        return {"mime_type": sniffed["mime_type"], "description": sniffed["description"]}
+
     if not check_tool('file'):
         return {"error": "file command not installed"}
 
     try:
         log_message("RUNNING", "FILE", "Identifying file type", file_path)
-        
-        result = subprocess.run(
-            ['file', '-b', '--mime-type', file_path],
-            capture_output=True, text=True, check=True, timeout=10
-        )
-        mime_type = result.stdout.strip()
-        
-        result2 = subprocess.run(
+
+        result = run_process(
             ['file', '-b', file_path],
-            capture_output=True, text=True, check=True, timeout=10
+            timeout=tool_timeout()
         )
-        description = result2.stdout.strip()
-        
+        description = result.stdout.strip()
+
+        # Not recognized from its signature (or plain text): file(1)'s answer is more specific
+        result2 = run_process(
+            ['file', '-b', '--mime-type', file_path],
+            timeout=tool_timeout()
+        )
+        mime_type = result2.stdout.strip()
+
         log_message("SUCCESS", "FILE", f"File type identified: {mime_type}", file_path)
-        
+
         return {
             "mime_type": mime_type,
             "description": description
@@ -205,102 +1352,1192 @@ def get_file_type_metadata(file_path):
         log_message("ERROR", "FILE", f"Failed to identify file type: {str(e)}", file_path)
         return {"error": str(e)}
 
-def get_zipinfo_metadata(file_path):
-    """Extract metadata using zipinfo"""
-    if not check_tool('zipinfo'):
-        return {"error": "zipinfo not installed"}
+ZIP_METHODS = {
+    0: "stored", 1: "shrunk", 6: "imploded", 8: "deflated", 9: "deflate64",
+    12: "bzip2", 14: "lzma", 93: "zstd", 95: "xz", 98: "ppmd", 99: "aes",
+}
 
+def get_zipinfo_metadata(file_path, offset=0, limit=None):
+    """Read a zip archive's central directory in-process, without reading member data"""
     try:
         log_message("RUNNING", "ZIPINFO", "Extracting archive information", file_path)
-        
-        result = subprocess.run(
-            ['zipinfo', '-l', file_path],
-            capture_output=True, text=True, check=True, timeout=30
-        )
-        
-        lines = result.stdout.split('\n')
+        limit = app.config['ZIPINFO_MAX_ENTRIES'] if limit is None else limit
+
+        # ZipFile only parses the end record and the central directory on open
+        with zipfile.ZipFile(file_path) as archive:
+            infos = archive.infolist()
+            comment = archive.comment.decode('utf-8', errors='replace')
+
+        entries = []
+        for info in infos[offset:offset + limit]:
+            entries.append({
+                "name": info.filename,
+                "size": info.file_size,
+                "compressed_size": info.compress_size,
+                "crc": f"{info.CRC:08x}",
+                "method": ZIP_METHODS.get(info.compress_type, str(info.compress_type)),
+                "modified": datetime(*info.date_time).isoformat() if info.date_time[0] >= 1980 else None,
+                "is_dir": info.is_dir(),
+                "encrypted": bool(info.flag_bits & 0x1),
+            })
+
+        files = [info for info in infos if not info.is_dir()]
+        total_size = sum(info.file_size for info in files)
+        total_compressed = sum(info.compress_size for info in files)
+        methods = {}
+        for info in files:
+            method = ZIP_METHODS.get(info.compress_type, str(info.compress_type))
+            methods[method] = methods.get(method, 0) + 1
+
         metadata = {
-            "files": [],
-            "summary": ""
+            "entries": entries,
+            "offset": offset,
+            "limit": limit,
+            "total_entries": len(infos),
+            "truncated": offset + limit < len(infos),
+            "comment": comment,
+            "stats": {
+                "files": len(files),
+                "directories": len(infos) - len(files),
+                "encrypted": sum(1 for info in files if info.flag_bits & 0x1),
+                "total_size": total_size,
+                "total_compressed": total_compressed,
+                "compression_ratio": round(total_size / total_compressed, 2) if total_compressed else None,
+                "methods": methods,
+                "largest_entries": [
+                    {"name": info.filename, "size": info.file_size, "compressed_size": info.compress_size}
+                    for info in heapq.nlargest(10, files, key=lambda info: info.file_size)
+                ],
+            },
+            "warnings": zip_bomb_warnings(infos, total_size, total_compressed),
         }
-        
-        for line in lines:
-            if line.strip():
-                metadata["files"].append(line)
-        
-        if metadata["files"]:
-            log_message("SUCCESS", "ZIPINFO", f"Archive contains {len(metadata['files'])} items", file_path)
-        else:
-            log_message("WARNING", "ZIPINFO", "No archive information found", file_path)
-            
+
+        log_message("SUCCESS", "ZIPINFO", f"Archive contains {len(infos)} items", file_path)
         return metadata
+    except zipfile.BadZipFile as e:
+        log_message("WARNING", "ZIPINFO", f"Not a readable zip archive: {str(e)}", file_path)
+        return {"error": f"Not a zip archive: {str(e)}"}
     except Exception as e:
         log_message("ERROR", "ZIPINFO", f"Failed to extract archive information: {str(e)}", file_path)
         return {"error": str(e)}
 
-def get_strings_metadata(file_path):
-    """Extract strings from binary files"""
-    if not check_tool('strings'):
-        return {"error": "strings command not installed"}
+def zip_bomb_warnings(infos, total_size, total_compressed):
+    """Heuristics for archives that expand far beyond their size or hide tricks"""
+    warnings = []
+    if total_compressed and total_size / total_compressed > app.config['ZIP_BOMB_RATIO']:
+        warnings.append(f"Overall compression ratio {total_size / total_compressed:.0f}:1 is suspiciously high")
+    if total_size > app.config['ZIP_BOMB_MAX_SIZE']:
+        warnings.append(f"Archive expands to {format_size(total_size)}")
+    if len(infos) > app.config['ZIP_BOMB_MAX_ENTRIES']:
+        warnings.append(f"Archive has {len(infos)} entries")
+
+    extreme = [info.filename for info in infos
+               if info.compress_size and info.file_size / info.compress_size > app.config['ZIP_BOMB_RATIO'] * 10]
+    if extreme:
+        warnings.append(f"{len(extreme)} entries compress more than {app.config['ZIP_BOMB_RATIO'] * 10}:1, e.g. {extreme[0]}")
+
+    # Entries whose data overlaps another entry are how non-recursive zip bombs reuse one stream
+    by_offset = sorted(infos, key=lambda info: info.header_offset)
+    overlapping = sum(
+        1 for current, following in zip(by_offset, by_offset[1:])
+        if current.header_offset + 30 + len(current.orig_filename.encode('utf-8', errors='replace'))
+        + current.compress_size > following.header_offset
+    )
+    if overlapping:
+        warnings.append(f"{overlapping} entries overlap the data of another entry")
+
+    nested = [info.filename for info in infos if info.filename.lower().endswith(('.zip', '.jar', '.apk', '.7z', '.rar', '.gz'))]
+    if nested:
+        warnings.append(f"{len(nested)} nested archives, e.g. {nested[0]}")
+
+    names = [info.filename for info in infos]
+    if len(set(names)) != len(names):
+        warnings.append("Archive contains duplicate entry names")
+    unsafe = [name for name in names if name.startswith(('/', '\\')) or '..' in name.replace('\\', '/').split('/')]
+    if unsafe:
+        warnings.append(f"{len(unsafe)} entries use absolute or parent paths, e.g. {unsafe[0]}")
+    return warnings
 
+# Maps printable ASCII (and tab) to 0 and every other byte to 1. In the mask a
+# `strings -n 4` string is a run of four or more zeros, found with bytes.count/find
+PRINTABLE_MASK = bytes(0 if 0x20 <= b <= 0x7e or b == 0x09 else 1 for b in range(256))
+STRING_START = b'\x01\x00\x00\x00\x00'
+
+INTERESTING_KEYWORDS = [
+    'http', 'https', 'ftp', 'www.', 'email', 'mailto:',
+    'password', 'pwd', 'token', 'api', 'key', 'secret',
+    '@', '://', '.com', '.org', '.net',
+]
+# One alternation over lowercased data instead of testing every keyword against every string
+INTERESTING_PATTERN = re.compile(b'|'.join(re.escape(keyword.encode('ascii')) for keyword in INTERESTING_KEYWORDS))
+
+STRINGS_CHUNK_SIZE = 4 * 1024 * 1024
+
+def _strings_chunk_end(data, start, end):
+    """Move a chunk end back to just after a non-printable byte so no string is split"""
+    if end >= len(data):
+        return len(data)
+    tail = data[max(start, end - 65536):end].translate(PRINTABLE_MASK)
+    index = tail.rfind(b'\x01')
+    if index < 0:
+        return end  # 64KB of text in a row, splitting it is harmless
+    return end - len(tail) + index + 1
+
+def get_strings_metadata(file_path):
+    """Extract interesting strings from binary files in-process, without running strings(1)"""
     try:
         log_message("RUNNING", "STRINGS", "Extracting strings from binary", file_path)
-        
-        result = subprocess.run(
-            ['strings', '-n', '4', file_path],  # Minimum 4 characters
-            capture_output=True, text=True, check=True, timeout=30
-        )
-        
-        strings_list = result.stdout.split('\n')
-        
-        # Filter for interesting strings
+
+        limit = app.config['STRINGS_LIMIT']
+        max_length = app.config['STRINGS_MAX_LENGTH']
+        stop_at = time.monotonic() + tool_timeout()
+        total = 0
+        position = 0
         interesting = []
-        for s in strings_list:
-            s = s.strip()
-            if len(s) >= 4:  # Minimum 4 characters
-                s_lower = s.lower()
-                if any(keyword in s_lower for keyword in 
-                       ['http', 'https', 'ftp', 'www.', 'email', 'mailto:', 
-                        'password', 'pwd', 'token', 'api', 'key', 'secret',
-                        '@', '://', '.com', '.org', '.net']):
-                    interesting.append(s)
-        
-        log_message("SUCCESS", "STRINGS", f"Found {len(strings_list)} total strings, {len(interesting)} interesting", file_path)
-        
+        complete = True
+
+        if os.path.getsize(file_path) > 0:
+            # The file is mapped and scanned in fixed-size chunks, memory use does not grow with file size
+            with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                while position < len(data) and complete:
+                    chunk = data[position:_strings_chunk_end(data, position, position + STRINGS_CHUNK_SIZE)]
+                    mask = chunk.translate(PRINTABLE_MASK)
+                    scanned = len(chunk)
+                    string_end = 0
+
+                    for hit in INTERESTING_PATTERN.finditer(chunk.lower()):
+                        if hit.start() < string_end:
+                            continue  # Another keyword in a string that was already taken
+                        string_start = mask.rfind(b'\x01', 0, hit.start()) + 1
+                        string_end = mask.find(b'\x01', hit.end())
+                        if string_end < 0:
+                            string_end = len(chunk)
+                        if string_end - string_start < 4:
+                            continue
+                        interesting.append(chunk[string_start:min(string_end, string_start + max_length)].decode('ascii').strip())
+                        if len(interesting) >= limit:
+                            scanned = string_end
+                            complete = False
+                            break
+
+                    # Every chunk starts right after a non-printable byte (or at the start of the file)
+                    total += mask.count(STRING_START, 0, scanned) + mask.startswith(STRING_START[1:])
+                    position += scanned
+                    if complete and position < len(data) and time.monotonic() > stop_at:
+                        complete = False
+
+        log_message("SUCCESS", "STRINGS", f"Found {total} total strings, {len(interesting)} interesting", file_path)
+
         return {
-            "total_strings": len(strings_list),
-            "interesting_strings": interesting[:30]  # Limit to 30
+            "total_strings": total,
+            "interesting_strings": interesting,
+            "scanned_bytes": position,
+            "complete": complete  # False when the scan stopped at the limit or the deadline
         }
     except Exception as e:
         log_message("ERROR", "STRINGS", f"Failed to extract strings: {str(e)}", file_path)
         return {"error": str(e)}
 
-def get_file_info(file_path):
-    """Get basic file information"""
-    try:
-        log_message("RUNNING", "FILE_INFO", "Getting file information", file_path)
-        
-        stat = os.stat(file_path)
-        file_name = os.path.basename(file_path)
-        file_ext = os.path.splitext(file_name)[1].lower()
-        mime_type = mimetypes.guess_type(file_path)[0] or "unknown"
+def get_file_info(file_path):
+    """Get basic file information"""
+    try:
+        log_message("RUNNING", "FILE_INFO", "Getting file information", file_path)
+        
+        stat = os.stat(file_path)
+        file_name = os.path.basename(file_path)
+        file_ext = os.path.splitext(file_name)[1].lower()
+        mime_type = mimetypes.guess_type(file_path)[0] or "unknown"
+
+        file_info = {
+            "name": file_name,
+            "extension": file_ext,
+            "mime_type": mime_type,
+            "size": stat.st_size,
+            "size_formatted": format_size(stat.st_size),
+            "created": datetime.fromtimestamp(stat.st_ctime).isoformat(),
+            "modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+            "accessed": datetime.fromtimestamp(stat.st_atime).isoformat(),
+        }
+        
+        log_message("SUCCESS", "FILE_INFO", f"File information collected: {file_info['size_formatted']}", file_path)
+        return file_info
+    except Exception as e:
+        log_message("ERROR", "FILE_INFO", f"Failed to get file information: {str(e)}", file_path)
+        return {"error": str(e)}
+
+# Extractors run by the scheduler, in the order they appear in responses
+EXTRACTORS = {
+    "exiftool": get_exiftool_metadata,
+    "mediainfo": get_mediainfo_metadata,
+    "ffprobe": get_ffprobe_metadata,
+    "pdf": get_pdf_metadata,
+    "identify": get_identify_metadata,
+    "file": get_file_type_metadata,
+    "zipinfo": get_zipinfo_metadata,
+    "strings": get_strings_metadata,
+}
+
+# Extractors that only repeat another one; they reuse its result instead of running again
+EXTRACTOR_ALIASES = {
+    "pdf": "exiftool",
+}
+
+# Extractors that only run when another one left MEDIA_FIELDS unanswered: tool -> (primary, answered)
+EXTRACTOR_FALLBACKS = {
+    "mediainfo": ("ffprobe", ffprobe_answers_media),
+}
+
+# File categories (from sniff_file_type) each extractor can say something about, None = all files.
+# Files of the "unknown" category were not recognized and go to every extractor.
+EXTRACTOR_ROUTES = {
+    "exiftool": None,
+    "mediainfo": {"video", "audio"},
+    "ffprobe": {"video", "audio"},
+    "pdf": {"pdf"},
+    "identify": {"image"},
+    "file": None,
+    "zipinfo": {"archive"},
+    "strings": None,
+}
+
+# Rough cost of each extractor: (seconds to start, seconds per MB of input)
+EXTRACTOR_COSTS = {
+    "exiftool": (0.05, 0.002),
+    "mediainfo": (0.05, 0.005),
+    "ffprobe": (0.08, 0.005),
+    "pdf": (0.0, 0.0),
+    "identify": (0.05, 0.001),
+    "file": (0.01, 0.0),
+    "zipinfo": (0.02, 0.002),
+    "strings": (0.01, 0.01),
+}
+
+def extractor_applies(name, category):
+    """Whether an extractor can say something about files of the given category"""
+    categories = EXTRACTOR_ROUTES[name]
+    return categories is None or category == "unknown" or category in categories
+
+def estimate_cost(name, size):
+    """Estimated seconds an extractor needs for a file of the given size"""
+    base, per_mb = EXTRACTOR_COSTS[name]
+    return base + per_mb * size / (1024 * 1024)
+
+def route_extractors(file_path, tools=None, deadline=None):
+    """Pick the extractors worth running on a file, most expensive first
+
+    Returns (selected tool names, {skipped tool: reason}, sniffed file type).
+    An explicit tools list bypasses the routing table and the cost model.
+    """
+    deadline = deadline or app.config['EXTRACTION_DEADLINE']
+    file_type = sniff_file_type(file_path)
+    size = os.path.getsize(file_path)
+
+    skipped = {}
+    if tools:
+        selected = list(tools)
+        for name in EXTRACTORS:
+            if name not in selected:
+                skipped[name] = "not requested"
+    else:
+        selected = []
+        for name in EXTRACTOR_ROUTES:
+            cost = estimate_cost(name, size)
+            if not extractor_applies(name, file_type["category"]):
+                skipped[name] = f"not applicable to {file_type['category']} files"
+            elif cost > deadline:
+                skipped[name] = f"estimated {cost:.1f}s exceeds the {deadline}s deadline"
+            else:
+                selected.append(name)
+
+    # Start the slow tools first so they don't end up waiting behind quick ones in the pool
+    selected.sort(key=lambda name: estimate_cost(name, size), reverse=True)
+    return selected, skipped, file_type
+
+# Shared by all requests so concurrent uploads cannot spawn unbounded tool processes
+EXTRACTOR_POOL = ThreadPoolExecutor(
+    max_workers=app.config['EXTRACTOR_WORKERS'], thread_name_prefix='extractor'
+)
+
+def _run_extractor(name, func, file_path, deadline, options=None, mime_type=None):
+    """Run one extractor on a pool thread under the request deadline"""
+    if time.monotonic() >= deadline:
+        # Queued behind other requests until the deadline passed, don't start it
+        return None, 0.0
+
+    _extraction_state.deadline = deadline
+    _extraction_state.stages = stages = {}
+    started = time.monotonic()
+    try:
+        result = func(file_path, **(options or {}))
+    except Exception as e:
+        log_message("ERROR", name, f"Extractor crashed: {str(e)}", file_path)
+        result = {"error": str(e)}
+    finally:
+        _extraction_state.deadline = None
+        _extraction_state.stages = None
+    elapsed = time.monotonic() - started
+
+    try:
+        input_bytes = os.path.getsize(file_path)
+    except OSError:
+        input_bytes = 0
+    if stages.pop("timed_out", False):
+        outcome = "timeout"
+    else:
+        outcome = "error" if isinstance(result, dict) and "error" in result else "ok"
+    # Every run that started is counted here, the scheduler only counts the ones that never did
+    record_extractor(name, mime_type, elapsed, outcome, stages, input_bytes)
+    return result, elapsed
+
+def iter_extractors(file_path, tools=None, deadline=None, precomputed=None, options=None, mime_type=None,
+                    fallbacks=None):
+    """Run extractors concurrently, yielding (tool, result) pairs as each one finishes
+
+    Tools still running at the deadline are yielded with a timeout marker. The last
+    pair is ("_pipeline", summary) with timings and the list of tools that timed out.
+    Results in precomputed (e.g. from a batched exiftool run) are used as they are.
+    options maps a tool name to keyword arguments for its extractor. mime_type
+    only labels the timing metrics. fallbacks maps a tool to (primary, answered):
+    it waits for primary and is skipped when answered(primary result) is true.
+    When audio/video tools ran, a merged "media" section comes before _pipeline.
+    """
+    precomputed = precomputed or {}
+    options = options or {}
+    fallbacks = fallbacks or {}
+    tools = tools or list(EXTRACTORS)
+    deadline = deadline or app.config['EXTRACTION_DEADLINE']
+    started = time.monotonic()
+    deadline_at = started + deadline
+
+    to_run = []
+    for name in tools:
+        name = EXTRACTOR_ALIASES.get(name, name)
+        if name not in to_run:
+            to_run.append(name)
+
+    # Tools that wait for their primary's result before deciding whether to run
+    held = {}
+    for name in to_run:
+        primary = fallbacks.get(name, (None, None))[0]
+        if primary in to_run and primary not in precomputed and name not in precomputed:
+            held.setdefault(primary, []).append(name)
+    held_names = {name for names in held.values() for name in names}
+
+    def submit(name):
+        future = EXTRACTOR_POOL.submit(
+            _run_extractor, name, EXTRACTORS[name], file_path, deadline_at, options.get(name), mime_type
+        )
+        futures[future] = name
+        return future
+
+    futures = {}
+    pending = {submit(name) for name in to_run if name not in precomputed and name not in held_names}
+
+    media_results = {}
+    def finished(name, result):
+        if name in MEDIA_NORMALIZERS:
+            media_results[name] = result
+        yield name, result
+        for alias, source in EXTRACTOR_ALIASES.items():
+            if source == name and alias in tools:
+                yield alias, result
+
+    for name in to_run:
+        if name in precomputed:
+            yield from finished(name, precomputed[name])
+
+    timings = {}
+    timed_out = []
+    not_started = []
+    answered = {}
+    while pending:
+        done, pending = wait(pending, timeout=max(0.0, deadline_at - time.monotonic()), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            name = futures[future]
+            result, elapsed = future.result()
+            if result is None:
+                timed_out.append(name)
+                not_started.append(name)
+                result = {"error": f"Timed out after {deadline}s", "timed_out": True}
+            else:
+                timings[name] = round(elapsed, 3)
+            yield from finished(name, result)
+
+            for dependent in held.pop(name, []):
+                if fallbacks[dependent][1](result):
+                    answered[dependent] = f"{name} already answered the requested fields"
+                else:
+                    pending.add(submit(dependent))
+
+    for future in pending:
+        if future.cancel():
+            not_started.append(futures[future])
+        # Still running otherwise; _run_extractor counts it once its tool is killed
+        timed_out.append(futures[future])
+        yield from finished(futures[future], {"error": f"Timed out after {deadline}s", "timed_out": True})
+    for name in (name for names in held.values() for name in names):
+        # Their primary never finished, so they never started
+        timed_out.append(name)
+        not_started.append(name)
+        yield from finished(name, {"error": f"Timed out after {deadline}s", "timed_out": True})
+
+    for name in not_started:
+        record_extractor(name, mime_type, deadline, "timeout")
+    if timed_out:
+        log_message("WARNING", "SCHEDULER", f"Deadline reached, unfinished tools: {', '.join(timed_out)}", file_path)
+
+    if media_results:
+        yield "media", merge_media(media_results)
+
+    yield "_pipeline", {
+        "elapsed": round(time.monotonic() - started, 3),
+        "deadline": deadline,
+        "timings": timings,
+        "timed_out": timed_out,
+        "precomputed": [name for name in to_run if name in precomputed],
+        "skipped": answered,
+    }
+
+def order_results(results):
+    """Put tool results back in EXTRACTORS order, then media and _pipeline"""
+    keys = ["file_info"] + list(EXTRACTORS) + ["media", "_pipeline"]
+    return {key: results[key] for key in keys if key in results}
+
+def run_extractors(file_path, tools=None, deadline=None, precomputed=None, options=None, mime_type=None,
+                   fallbacks=None):
+    """Run extractors concurrently and collect whatever finishes before the deadline"""
+    return order_results(dict(iter_extractors(file_path, tools, deadline, precomputed, options, mime_type, fallbacks)))
+
+class MetadataCache:
+    """LRU cache of extractor results keyed by file content and tool versions"""
+
+    def __init__(self, max_entries, db_path=None):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.connect(db_path)
+
+    def connect(self, db_path):
+        """Open (or reopen after fork) the on-disk cache, shared by every process using the same path"""
+        db = None
+        if db_path:
+            db = sqlite3.connect(db_path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(key TEXT PRIMARY KEY, digest TEXT NOT NULL, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS results_digest ON results (digest)")
+            db.commit()
+        with self._lock:
+            self._db = db
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+            value = None
+            if self._db is not None:
+                row = self._db.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+                if row:
+                    value = json.loads(row[0])
+                    self._remember(key, value)
+
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, digest, value, created) VALUES (?, ?, ?, ?)",
+                    (key, key.split(':', 1)[0], json.dumps(value), time.time())
+                )
+                self._db.commit()
+
+    def _remember(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, digest):
+        """Drop every cached result for the given content digest"""
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(digest + ':')]:
+                del self._entries[key]
+            if self._db is not None:
+                self._db.execute("DELETE FROM results WHERE digest = ?", (digest,))
+                self._db.commit()
+
+METADATA_CACHE = MetadataCache(app.config['METADATA_CACHE_SIZE'], app.config['METADATA_CACHE_DB'])
+METRICS.gauge("metadata_cache_hits_total", "Metadata cache hits", lambda: METADATA_CACHE.hits, kind="counter")
+METRICS.gauge("metadata_cache_misses_total", "Metadata cache misses", lambda: METADATA_CACHE.misses, kind="counter")
+METRICS.gauge("metadata_cache_hit_ratio", "Share of metadata cache lookups that were hits",
+              lambda: METADATA_CACHE.hits / max(1, METADATA_CACHE.hits + METADATA_CACHE.misses))
+
+# path -> (inode, size, mtime_ns, sha256) so repeated views don't rehash the file
+_digest_memo = {}
+_digest_lock = threading.Lock()
+
+def file_digest(file_path):
+    """SHA-256 of the file content, memoized until the file changes on disk"""
+    stat = os.stat(file_path)
+    signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    with _digest_lock:
+        memo = _digest_memo.get(file_path)
+    if memo and memo[:3] == signature:
+        return memo[3]
+
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    digest = sha256.hexdigest()
+
+    with _digest_lock:
+        _digest_memo[file_path] = signature + (digest,)
+    return digest
+
+def remember_digest(file_path, digest):
+    """Record a digest computed elsewhere (e.g. while the file was uploaded)"""
+    stat = os.stat(file_path)
+    with _digest_lock:
+        _digest_memo[file_path] = (stat.st_ino, stat.st_size, stat.st_mtime_ns, digest)
+
+def invalidate_file(file_path):
+    """Forget the digest of a file that was changed or removed
+
+    Cached extractor results are dropped once no stored upload has that content anymore.
+    """
+    with _digest_lock:
+        memo = _digest_memo.pop(file_path, None)
+    if memo:
+        release_object(memo[3])
+    file_id = upload_file_id(file_path)
+    if file_id:
+        # Re-read its size after an edit, or drop it after a delete
+        STORAGE.add(file_id, file_path)
+        if SEARCH_INDEX is not None:
+            SEARCH_INDEX.remove(file_id)
+
+def metadata_cache_key(file_path, selected, options=None):
+    """Cache key for the given extractors and their options on the current content of a file"""
+    key = f"{file_digest(file_path)}:{TOOL_REGISTRY.signature()}:{','.join(sorted(selected))}"
+    used = {name: options[name] for name in selected if options and options.get(name)}
+    if used:
+        key += ":" + json.dumps(used, sort_keys=True, separators=(',', ':'))
+    return key
+
+def iter_metadata(file_path, tools=None, options=None):
+    """Yield (section, data) pairs for a file as soon as each one is available
+
+    Starts with file_info, then one pair per extractor, and ends with _pipeline.
+    Served from the result cache when the same content was extracted before.
+    """
+    # Keep the janitor away from an upload while its tools run
+    with STORAGE.pinned([upload_file_id(file_path)]):
+        file_info = get_file_info(file_path)
+        yield "file_info", file_info
+        selected, skipped, file_type = route_extractors(file_path, tools)
+
+        cache_key = metadata_cache_key(file_path, selected, options)
+        results = METADATA_CACHE.get(cache_key)
+        if results is not None:
+            log_message("INFO", "CACHE", "Serving cached metadata", file_path)
+            for name, result in results.items():
+                if name != "_pipeline":
+                    yield name, result
+            yield "_pipeline", dict(results["_pipeline"], cached=True)
+            index_upload(file_path, dict(results, file_info=file_info))
+            return
+
+        results = {}
+        for name, result in iter_extractors(file_path, selected, options=options, mime_type=file_type["mime_type"],
+                                            fallbacks=EXTRACTOR_FALLBACKS):
+            if name == "_pipeline":
+                result["file_type"] = file_type
+                result["skipped"] = dict(skipped, **result["skipped"])
+            results[name] = result
+            yield name, result
+
+        # Partial results are not worth keeping, the next request may finish in time
+        if not results["_pipeline"]["timed_out"]:
+            METADATA_CACHE.put(cache_key, order_results(results))
+            index_upload(file_path, dict(results, file_info=file_info))
+
+def collect_metadata(file_path, tools=None, options=None):
+    """Collect file information and the output of the extractors that apply to the file"""
+    return order_results(dict(iter_metadata(file_path, tools, options)))
+
+def _index_fields(compact):
+    """(key, value) pairs worth searching on from a compact metadata document"""
+    for section in ("file", "tags", "image"):
+        for key, value in compact.get(section, {}).items():
+            yield f"{section}.{key}", value
+    media = compact.get("media", {})
+    for key in ("format", "duration", "bit_rate"):
+        yield f"media.{key}", media.get(key)
+    for stream in media.get("streams", []):
+        for key, value in stream.items():
+            if key != "type":
+                yield f"media.{stream['type']}.{key}", value
+    archive = compact.get("archive", {})
+    if archive:
+        yield "archive.total_entries", archive.get("total_entries")
+        for key, value in archive.get("stats", {}).items():
+            yield f"archive.{key}", value
+        yield "archive.suspicious", bool(archive.get("warnings"))
+    for key, value in compact.get("strings", {}).items():
+        if key != "interesting":
+            yield f"strings.{key}", value
+
+# Suffixes accepted on numbers in search queries, e.g. duration>1h or file.size>10MB
+SEARCH_UNITS = {
+    's': 1, 'm': 60, 'min': 60, 'h': 3600, 'd': 86400,
+    'b': 1, 'kb': 1024, 'mb': 1024 ** 2, 'gb': 1024 ** 3,
+}
+SEARCH_TERM = re.compile(r'^([\w.:-]+?)(>=|<=|!=|=|>|<)(.*)$')
+
+def _search_number(value):
+    """Number in value with an optional unit suffix, or None"""
+    match = re.match(r'^\s*(-?\d+(?:\.\d+)?)\s*([a-zA-Z]*)\s*$', str(value))
+    if not match:
+        return None
+    unit = match.group(2).lower() or 'b'
+    if unit not in SEARCH_UNITS:
+        return None
+    return float(match.group(1)) * SEARCH_UNITS[unit]
+
+class MetadataIndex:
+    """SQLite index of uploaded files' metadata for field queries and full-text search
+
+    Fields are stored one row per (file, key) with the value as text and, when it is
+    numeric, as a number, so equality and range queries use indexes. Interesting strings,
+    the file name and tag values go into an FTS5 table.
+    """
+
+    # Newest files probed one by one before a query falls back to the field indexes
+    WALK_ROWS = 5000
+
+    def __init__(self, db_path):
+        self._lock = threading.Lock()
+        self.connect(db_path)
+
+    def connect(self, db_path):
+        """Open (or reopen after fork) the index database"""
+        db = sqlite3.connect(db_path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                file_id TEXT PRIMARY KEY, digest TEXT NOT NULL, tools TEXT NOT NULL DEFAULT '',
+                mime_type TEXT, category TEXT, size INTEGER, indexed REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS fields (
+                file_id TEXT NOT NULL, key TEXT NOT NULL, name TEXT NOT NULL,
+                value TEXT COLLATE NOCASE, number REAL
+            );
+            CREATE INDEX IF NOT EXISTS fields_key_value ON fields (key, value);
+            CREATE INDEX IF NOT EXISTS fields_name_value ON fields (name, value);
+            CREATE INDEX IF NOT EXISTS fields_key_number ON fields (key, number);
+            CREATE INDEX IF NOT EXISTS fields_name_number ON fields (name, number);
+            CREATE INDEX IF NOT EXISTS fields_file ON fields (file_id);
+            CREATE INDEX IF NOT EXISTS files_indexed ON files (indexed);
+            CREATE VIRTUAL TABLE IF NOT EXISTS text USING fts5(file_id UNINDEXED, content);
+        """)
+        if 'tools' not in [column[1] for column in db.execute("PRAGMA table_info(files)")]:
+            db.execute("ALTER TABLE files ADD COLUMN tools TEXT NOT NULL DEFAULT ''")
+        db.commit()
+        with self._lock:
+            self._db = db
+
+    def add(self, file_id, digest, metadata, size=None, force=False):
+        """Index a file's collected metadata
+
+        Skipped when this content is already indexed from the same or more extractors, so a
+        later ?tools= subset does not replace a full extraction but a full one replaces a subset.
+        """
+        tools = sorted(name for name in metadata if name in EXTRACTORS)
+        with self._lock:
+            row = self._db.execute("SELECT digest, tools FROM files WHERE file_id = ?", (file_id,)).fetchone()
+        if not force and row and row[0] == digest and set(tools) <= set(row[1].split(',')):
+            return False
+
+        compact = compact_metadata(metadata)
+        rows = []
+        words = [file_id]
+        for key, value in _index_fields(compact):
+            if isinstance(value, list) and not any(isinstance(item, (dict, list)) for item in value):
+                value = ", ".join(str(item) for item in value)
+            if value is None or value == "" or isinstance(value, (dict, list)):
+                continue
+            if isinstance(value, bool):
+                text, number = str(value).lower(), float(value)
+            else:
+                text, number = str(value), _search_number(value) if not isinstance(value, (int, float)) else value
+            rows.append((file_id, key, key.rsplit('.', 1)[-1], text, number))
+            if key.startswith("tags.") and isinstance(value, str):
+                words.append(value)
+        words += compact.get("strings", {}).get("interesting") or []
+        file_section = compact["file"]
+
+        with self._lock:
+            self._delete(file_id)
+            self._db.execute(
+                "INSERT INTO files (file_id, digest, tools, mime_type, category, size, indexed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (file_id, digest, ",".join(tools), file_section.get("mime_type"), file_section.get("category"),
+                 size if size is not None else file_section.get("size"), time.time())
+            )
+            self._db.executemany("INSERT INTO fields (file_id, key, name, value, number) VALUES (?, ?, ?, ?, ?)", rows)
+            self._db.execute("INSERT INTO text (file_id, content) VALUES (?, ?)", (file_id, "\n".join(words)))
+            self._db.commit()
+        return True
+
+    def _delete(self, file_id):
+        self._db.execute("DELETE FROM files WHERE file_id = ?", (file_id,))
+        self._db.execute("DELETE FROM fields WHERE file_id = ?", (file_id,))
+        self._db.execute("DELETE FROM text WHERE file_id = ?", (file_id,))
+
+    def remove(self, file_id):
+        with self._lock:
+            self._delete(file_id)
+            self._db.commit()
+
+    def search(self, query, limit=50, offset=0):
+        """Files matching every term of query, newest first
+
+        Terms: key=value, key!=value, key>number (also <, >=, <=, with units such as 1h
+        or 10MB), has:key, and anything else as full-text search. key is a full path
+        such as tags.Model or media.video.width, or just its last part (Model).
+        """
+        # (condition on fields rows, negated) per field term, full-text terms separately
+        conditions, texts = [], []
+        for term in shlex.split(query):
+            if term.startswith('has:'):
+                column, key = self._key_column(term[4:])
+                if key.endswith('*'):
+                    conditions.append((f"{column} GLOB ?", [key.replace('[', '[[]').replace('?', '[?]')[:-1] + '*'], False))
+                else:
+                    conditions.append((f"{column} = ?", [key], False))
+                continue
+
+            match = SEARCH_TERM.match(term)
+            if not match:
+                texts.append('"' + term.replace('"', '""') + '"')
+                continue
+
+            key, operator, value = match.groups()
+            column, key = self._key_column(key)
+            if operator in ('=', '!='):
+                conditions.append((f"{column} = ? AND value = ?", [key, value], operator == '!='))
+            else:
+                number = _search_number(value)
+                if number is None:
+                    raise ValueError(f"{term}: {value!r} is not a number")
+                conditions.append((f"{column} = ? AND number {operator} ?", [key, number], False))
+
+        text_clauses = ["file_id IN (SELECT file_id FROM text WHERE text MATCH ?)"] * len(texts)
+        # Probe one file's fields at a time, for walking files in index order
+        probes = [
+            ("NOT " if negated else "") +
+            f"EXISTS (SELECT 1 FROM fields INDEXED BY fields_file WHERE fields.file_id = files.file_id AND {condition})"
+            for condition, _, negated in conditions
+        ]
+        params = texts + [value for _, values, _ in conditions for value in values]
+        sql = "SELECT file_id, mime_type, category, size, indexed FROM files"
+
+        with self._lock:
+            rows = None
+            if not texts and offset + limit <= self.WALK_ROWS:
+                # Most queries match plenty of recent files: walk the newest ones along the
+                # indexed index, which stops as soon as the page is full
+                oldest = self._db.execute("SELECT indexed FROM files ORDER BY indexed DESC LIMIT 1 OFFSET ?",
+                                          (self.WALK_ROWS - 1,)).fetchone()
+                clauses = probes + (["indexed >= ?"] if oldest else [])
+                rows = self._db.execute(
+                    f"{sql} INDEXED BY files_indexed{' WHERE ' + ' AND '.join(clauses) if clauses else ''} "
+                    "ORDER BY indexed DESC LIMIT ? OFFSET ?",
+                    params + list(oldest or []) + [limit, offset]
+                ).fetchall()
+                if len(rows) < limit and oldest:
+                    rows = None
+
+            if rows is None:
+                if texts:
+                    # Full-text matches are few: start from them and probe their fields
+                    clauses = text_clauses + probes
+                else:
+                    # Rare matches or deep pages: collect matching files from the field indexes
+                    clauses = [
+                        f"file_id {'NOT IN' if negated else 'IN'} (SELECT file_id FROM fields WHERE {condition})"
+                        for condition, _, negated in conditions
+                    ]
+                rows = self._db.execute(
+                    f"{sql}{' WHERE ' + ' AND '.join(clauses) if clauses else ''} ORDER BY indexed DESC LIMIT ? OFFSET ?",
+                    params + [limit, offset]
+                ).fetchall()
+        return [
+            {"file_id": file_id, "mime_type": mime_type, "category": category, "size": size,
+             "indexed": datetime.fromtimestamp(indexed).isoformat()}
+            for file_id, mime_type, category, size, indexed in rows
+        ]
+
+    @staticmethod
+    def _key_column(key):
+        return ("key", key) if '.' in key else ("name", key)
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def file_ids(self):
+        with self._lock:
+            return {row[0] for row in self._db.execute("SELECT file_id FROM files")}
+
+SEARCH_INDEX = MetadataIndex(app.config['SEARCH_INDEX_DB']) if app.config['SEARCH_INDEX_DB'] else None
+
+def upload_file_id(file_path):
+    """file_id of a path inside the upload folder, or None for any other path"""
+    directory = os.path.dirname(os.path.abspath(file_path))
+    if directory != os.path.abspath(app.config['UPLOAD_FOLDER']):
+        return None
+    return os.path.basename(file_path)
+
+def index_upload(file_path, metadata, force=False):
+    """Add an uploaded file's metadata to the search index once its extraction finished
+
+    Returns True when the file was (re-)indexed.
+    """
+    file_id = upload_file_id(file_path)
+    if SEARCH_INDEX is None or file_id is None:
+        return False
+    try:
+        if SEARCH_INDEX.add(file_id, file_digest(file_path), metadata, os.path.getsize(file_path), force):
+            log_message("INFO", "INDEX", "Metadata indexed", file_path)
+            return True
+    except Exception as e:
+        log_message("ERROR", "INDEX", f"Indexing failed: {str(e)}", file_path)
+    return False
+
+def rebuild_search_index(extract=False):
+    """Re-index every upload from the result cache
+
+    Only the cached result of the full routed pipeline is used; results of a ?tools=
+    subset would replace a fuller entry. Uploads without one are extracted again when
+    extract is set, otherwise their current index entry is kept. Entries of files that
+    no longer exist are removed. Returns counts of indexed, extracted, kept and removed files.
+    """
+    counts = {"indexed": 0, "extracted": 0, "kept": 0, "removed": 0}
+    uploads = set()
+    with os.scandir(app.config['UPLOAD_FOLDER']) as entries:
+        for entry in entries:
+            if not entry.is_file(follow_symlinks=False) or entry.name.startswith('.'):
+                continue
+            uploads.add(entry.name)
+            selected = route_extractors(entry.path)[0]
+            results = METADATA_CACHE.get(metadata_cache_key(entry.path, selected))
+            if results is not None:
+                metadata = dict(results, file_info=get_file_info(entry.path))
+            elif extract:
+                metadata = collect_metadata(entry.path)
+                counts["extracted"] += 1
+            else:
+                counts["kept"] += 1
+                continue
+            if metadata["_pipeline"]["timed_out"]:
+                # Partial, the existing entry may know more
+                counts["kept"] += 1
+            elif index_upload(entry.path, metadata, force=True):
+                counts["indexed"] += 1
+            else:
+                counts["kept"] += 1
+
+    for file_id in SEARCH_INDEX.file_ids() - uploads:
+        SEARCH_INDEX.remove(file_id)
+        counts["removed"] += 1
+    log_message("SUCCESS", "INDEX", "Rebuilt search index: " + ", ".join(f"{n} {k}" for k, n in counts.items()))
+    return counts
+
+def extract_many(file_paths, tools=None, deadline=None, use_cache=False):
+    """Yield (path, metadata) for many files, running exiftool once per chunk
+
+    Other extractors still run per file. A file that cannot be processed is
+    yielded with the exception instead of its metadata.
+    """
+    routes = {}
+    for file_path in file_paths:
+        try:
+            routes[file_path] = route_extractors(file_path, tools, deadline)
+        except Exception as e:
+            routes[file_path] = e
+
+    cached = {}
+    if use_cache:
+        for file_path, route in routes.items():
+            if not isinstance(route, Exception):
+                cache_key = metadata_cache_key(file_path, route[0])
+                results = METADATA_CACHE.get(cache_key)
+                if results is not None:
+                    cached[file_path] = dict(results, _pipeline=dict(results["_pipeline"], cached=True))
+                else:
+                    route += (cache_key,)
+                    routes[file_path] = route
+
+    needs_exiftool = [
+        file_path for file_path, route in routes.items()
+        if file_path not in cached
+        and not isinstance(route, Exception)
+        and any(EXTRACTOR_ALIASES.get(name, name) == 'exiftool' for name in route[0])
+    ]
+    batch_started = time.monotonic()
+    exiftool_results = get_exiftool_metadata_batch(needs_exiftool) if needs_exiftool else {}
+    # Spread the batch time over its files so per-tool totals stay comparable
+    exiftool_seconds = (time.monotonic() - batch_started) / max(1, len(needs_exiftool))
+
+    for file_path, route in routes.items():
+        try:
+            if isinstance(route, Exception):
+                raise route
+            metadata = {"file_info": get_file_info(file_path)}
+            if file_path in cached:
+                metadata.update(cached[file_path])
+                yield file_path, metadata
+                continue
+
+            selected, skipped, file_type = route[:3]
+            precomputed = {'exiftool': exiftool_results[file_path]} if file_path in exiftool_results else None
+            results = run_extractors(file_path, selected, deadline, precomputed, mime_type=file_type["mime_type"],
+                                     fallbacks=EXTRACTOR_FALLBACKS)
+            if precomputed:
+                results["_pipeline"]["timings"]["exiftool"] = round(exiftool_seconds, 3)
+                outcome = "error" if "error" in precomputed["exiftool"] else "ok"
+                record_extractor("exiftool", file_type["mime_type"], exiftool_seconds, outcome,
+                                 input_bytes=os.path.getsize(file_path))
+            results["_pipeline"]["file_type"] = file_type
+            results["_pipeline"]["skipped"] = dict(skipped, **results["_pipeline"]["skipped"])
+            if use_cache and not results["_pipeline"]["timed_out"]:
+                METADATA_CACHE.put(route[3], results)
+            metadata.update(results)
+            yield file_path, metadata
+        except Exception as e:
+            yield file_path, e
+
+class JobQueue:
+    """Bounded in-process queue of multi-file extraction jobs run by background threads
+
+    With a database, every job's progress and results are also written to SQLite so any
+    server process can answer for jobs another process is running.
+    """
+
+    def __init__(self, workers, max_queued, history, db_path=None):
+        self.workers = workers
+        self.history = history
+        self.closing = False
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._db = None
+        self.connect(db_path)
+
+    def connect(self, db_path):
+        """Open (or reopen after fork) the shared job database"""
+        db = None
+        if db_path:
+            db = sqlite3.connect(db_path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, value TEXT NOT NULL, updated REAL NOT NULL);
+                CREATE TABLE IF NOT EXISTS job_results (
+                    job_id TEXT NOT NULL, file_id TEXT NOT NULL, value TEXT NOT NULL, PRIMARY KEY (job_id, file_id)
+                );
+            """)
+            db.commit()
+        with self._lock:
+            self._db = db
+
+    def full(self):
+        return self._queue.full()
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def submit(self, files, tools=None):
+        """Queue a job for [(file_id, path)], raising queue.Full when the queue is at capacity"""
+        job_id = hashlib.sha1(f"{time.time()}:{os.getpid()}:{id(files)}".encode()).hexdigest()[:16]
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "created": datetime.now().isoformat(),
+            "total": len(files),
+            "completed": 0,
+            "failed": 0,
+            "files": [file_id for file_id, _ in files],
+            "results": {},
+        }
+        with self._lock:
+            if self.closing:
+                raise queue.Full()
+            self._queue.put_nowait((job_id, files, tools))
+            self._jobs[job_id] = job
+            self._forget_old_jobs()
+            self._save(job)
+            self._start_workers()
+        log_message("INFO", "JOBS", f"Queued job {job_id} with {len(files)} files")
+        return job_id
+
+    def get(self, job_id, with_results=True):
+        """Snapshot of a job's progress, or None if it is unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return self._load(job_id, with_results)
+            snapshot = dict(job, files=list(job["files"]))
+            snapshot["results"] = dict(job["results"]) if with_results else None
+        return snapshot
+
+    def active_files(self):
+        """file_ids of every queued or running job, including jobs of other server processes"""
+        with self._lock:
+            files = {file_id for job in self._jobs.values() if job["status"] in ("queued", "running")
+                     for file_id in job["files"]}
+            if self._db is not None:
+                for (value,) in self._db.execute("SELECT value FROM jobs"):
+                    job = json.loads(value)
+                    if job["status"] in ("queued", "running"):
+                        files.update(job["files"])
+        return files
+
+    def _save(self, job, file_id=None):
+        """Write a job's progress, and the result of file_id, to the shared database (lock held)"""
+        if self._db is None:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO jobs (job_id, value, updated) VALUES (?, ?, ?)",
+            (job["job_id"], json.dumps(dict(job, results=None)), time.time())
+        )
+        if file_id is not None:
+            self._db.execute(
+                "INSERT OR REPLACE INTO job_results (job_id, file_id, value) VALUES (?, ?, ?)",
+                (job["job_id"], file_id, json.dumps(job["results"][file_id]))
+            )
+        self._db.commit()
+
+    def _load(self, job_id, with_results):
+        """A job run by another process, from the shared database (lock held)"""
+        if self._db is None:
+            return None
+        row = self._db.execute("SELECT value FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = json.loads(row[0])
+        if with_results:
+            job["results"] = {
+                file_id: json.loads(value) for file_id, value in
+                self._db.execute("SELECT file_id, value FROM job_results WHERE job_id = ?", (job_id,))
+            }
+        return job
+
+    def _forget_old_jobs(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in ("done", "failed")]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+        if self._db is not None:
+            old = [row[0] for row in self._db.execute(
+                "SELECT job_id FROM jobs ORDER BY updated DESC LIMIT -1 OFFSET ?", (self.history + self._queue.maxsize,)
+            )]
+            for job_id in old:
+                self._db.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+                self._db.execute("DELETE FROM job_results WHERE job_id = ?", (job_id,))
+
+    def _start_workers(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"job-worker-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            job_id, files, tools = self._queue.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is not None:
+                    job["status"] = "running"
+                    self._save(job)
+            try:
+                if job is not None:
+                    self._run(job, files, tools)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job, files, tools):
+        file_ids = {path: file_id for file_id, path in files}
+        try:
+            for chunk in chunk_files(list(file_ids)):
+                for file_path, metadata in extract_many(chunk, tools, use_cache=True):
+                    if isinstance(metadata, Exception):
+                        metadata = {"error": str(metadata)}
+                    elif not metadata["_pipeline"]["timed_out"]:
+                        index_upload(file_path, metadata)
+                    with self._lock:
+                        job["results"][file_ids[file_path]] = metadata
+                        job["completed"] += 1
+                        job["failed"] += "error" in metadata
+                        self._save(job, file_ids[file_path])
+            status = "done"
+            log_message("SUCCESS", "JOBS", f"Job {job['job_id']} finished: {job['completed']} files")
+        except Exception as e:
+            status = "failed"
+            with self._lock:
+                job["error"] = str(e)
+            log_message("ERROR", "JOBS", f"Job {job['job_id']} failed: {str(e)}")
+        with self._lock:
+            if job["status"] == "running":
+                job["status"] = status
+                job["finished"] = datetime.now().isoformat()
+                self._save(job)
+
+    def drain(self, timeout):
+        """Stop taking jobs and wait up to timeout seconds for queued and running ones
+
+        Jobs still unfinished afterwards are marked failed. Returns True if all finished.
+        """
+        with self._lock:
+            self.closing = True
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.1)
 
-        file_info = {
-            "name": file_name,
-            "extension": file_ext,
-            "mime_type": mime_type,
-            "size": stat.st_size,
-            "size_formatted": format_size(stat.st_size),
-            "created": datetime.fromtimestamp(stat.st_ctime).isoformat(),
-            "modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-            "accessed": datetime.fromtimestamp(stat.st_atime).isoformat(),
-        }
-        
-        log_message("SUCCESS", "FILE_INFO", f"File information collected: {file_info['size_formatted']}", file_path)
-        return file_info
-    except Exception as e:
-        log_message("ERROR", "FILE_INFO", f"Failed to get file information: {str(e)}", file_path)
-        return {"error": str(e)}
+        with self._lock:
+            unfinished = [job for job in self._jobs.values() if job["status"] in ("queued", "running")]
+            for job in unfinished:
+                job.update(status="failed", error="Server shut down before the job finished",
+                           finished=datetime.now().isoformat())
+                self._save(job)
+        if unfinished:
+            log_message("WARNING", "JOBS", f"{len(unfinished)} jobs interrupted by shutdown")
+        return not unfinished
+
+JOB_QUEUE = JobQueue(app.config['JOB_WORKERS'], app.config['JOB_QUEUE_SIZE'], app.config['JOB_HISTORY'],
+                     app.config['JOB_DB'])
+METRICS.gauge("metadata_job_queue_depth", "Jobs waiting for a job worker", JOB_QUEUE.depth)
+# ThreadPoolExecutor has no public queue length
+METRICS.gauge("metadata_extractor_queue_depth", "Extractor runs waiting for a pool thread",
+              lambda: EXTRACTOR_POOL._work_queue.qsize())
 
 def format_size(bytes):
     """Format bytes to human readable size"""
@@ -313,7 +2550,6 @@ def format_size(bytes):
 def validate_metadata_key(key):
     """Validate and clean metadata key for exiftool"""
     # Remove spaces and special characters, keep only alphanumeric
-    import re
     clean_key = re.sub(r'[^a-zA-Z0-9]', '', key)
     return clean_key
 
@@ -344,23 +2580,26 @@ def add_metadata(file_path, metadata_dict):
         return {"success": False, "error": "exiftool not installed"}
 
     try:
-        log_message("RUNNING", "EXIFTOOL", f"Adding metadata: {metadata_dict}", file_path)
+        log_message("RUNNING", "EXIFTOOL", f"Adding metadata: {', '.join(metadata_dict)}", file_path)
         
-        cmd = ['exiftool', '-overwrite_original']
+        args = ['-overwrite_original']
         for key, value in metadata_dict.items():
             # Clean the key - remove spaces and special characters
             clean_key = validate_metadata_key(key)
             if clean_key:  # Only add if key is not empty
-                cmd.append(f'-{clean_key}={value}')
+                args.append(f'-{clean_key}={value}')
         
-        cmd.append(file_path)
+        args.append(file_path)
         
-        log_message("DEBUG", "EXIFTOOL", f"Running command: {' '.join(cmd)}", file_path)
+        if LOGGER.enabled("DEBUG"):
+            # Values can be long (or sensitive), only build this line when DEBUG is on
+            log_message("DEBUG", "EXIFTOOL", f"Running command: exiftool {' '.join(args)}", file_path)
         
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        result = run_exiftool(args)
         
         # Check if command was successful
         if result.returncode == 0:
+            invalidate_file(file_path)
             log_message("SUCCESS", "EXIFTOOL", "Metadata added successfully", file_path)
             return {"success": True, "message": "Metadata added successfully"}
         else:
@@ -372,21 +2611,987 @@ def add_metadata(file_path, metadata_dict):
         log_message("ERROR", "EXIFTOOL", f"Exception while adding metadata: {str(e)}", file_path)
         return {"success": False, "error": str(e)}
 
+# Printed by exiftool (-echo3) between the write and the read-back in a batch write
+WRITE_MARKER = '{batch_written}'
+
+def batch_backup_path(file_path):
+    """Where write_metadata_batch keeps a file's pre-write content, hidden from the upload listing"""
+    return os.path.join(os.path.dirname(file_path), '.backup', os.path.basename(file_path))
+
+def _backup_before_write(file_path):
+    """Keep a file's current content in .backup/: a hardlink, or a copy where links are not supported"""
+    backup = batch_backup_path(file_path)
+    os.makedirs(os.path.dirname(backup), exist_ok=True)
+    if os.path.lexists(backup):
+        # Left by a server that died mid-batch, the rollback would restore the wrong content
+        raise FileExistsError("A backup from an earlier batch still exists")
+    try:
+        os.link(file_path, backup)
+    except OSError:
+        shutil.copy2(file_path, backup)
+
+def _tag_name(key):
+    """Tag name as exiftool -json reports it: without group prefix, compared case-insensitively"""
+    return key.rsplit(':', 1)[-1].lower()
+
+def _missing_tags(tags, metadata):
+    """Requested tags (other than deletions) that the read-back does not have"""
+    present = {_tag_name(key) for key in metadata}
+    return [key for key, value in tags.items() if value != '' and _tag_name(key) not in present]
+
+def write_metadata_batch(edits):
+    """Write tags to many files as one transaction, with one exiftool run per chunk
+
+    edits is [(file_path, {tag: value})]; files sharing a tag set are written together.
+    Each file is backed up into .backup/ before its chunk runs; exiftool replaces the
+    file rather than editing it in place, so a hardlink keeps the old content. Backups
+    are removed once every file is written, or moved back over the written files if any
+    file failed or anything raised. A file fails on an exiftool error, a non-zero exit
+    status, or a read-back (from the same exiftool run) without the requested tags;
+    successful results carry the updated metadata. Returns (success, {file_path: result}).
+    """
+    if not check_tool('exiftool'):
+        return False, {file_path: {"success": False, "error": "exiftool not installed"} for file_path, _ in edits}
+
+    groups = OrderedDict()
+    for file_path, tags in edits:
+        groups.setdefault(json.dumps(tags, sort_keys=True), (tags, []))[1].append(file_path)
+
+    results = {}
+    # file_path -> stat before the write, for every file with a backup
+    backed_up = OrderedDict()
+    failed = committed = False
+    try:
+        for tags, paths in groups.values():
+            tag_args = ['-overwrite_original'] + [f'-{key}={value}' for key, value in tags.items()]
+            for chunk in chunk_files(paths):
+                if failed:
+                    break
+                log_message("RUNNING", "EXIFTOOL", f"Writing {len(tags)} tags to {len(chunk)} files in one batch")
+
+                for file_path in chunk:
+                    stat = os.stat(file_path)
+                    try:
+                        _backup_before_write(file_path)
+                    except FileExistsError as e:
+                        results[file_path] = {"success": False, "error": str(e)}
+                        failed = True
+                    else:
+                        backed_up[file_path] = stat
+                if failed:
+                    break
+
+                by_source = {os.path.normpath(file_path): file_path for file_path in chunk}
+                timeout = app.config['EXTRACTION_DEADLINE'] + sum(
+                    2 * estimate_cost('exiftool', os.path.getsize(file_path)) for file_path in chunk
+                )
+                # The marker carries the write's own exit status, the run's returncode is the read-back's
+                try:
+                    result = run_exiftool(
+                        tag_args + ['-echo3', WRITE_MARKER + '${status}'] + chunk + ['-execute', '-json'] + chunk,
+                        timeout=timeout
+                    )
+                except (OSError, ExifToolError, ProcessLimitError, subprocess.SubprocessError) as e:
+                    result = subprocess.CompletedProcess([], None, '', '')
+                    errors = {file_path: str(e) for file_path in chunk}
+                else:
+                    errors = exiftool_file_errors(result.stderr, by_source, prefix='Error')
+
+                _, marker, after = result.stdout.partition(WRITE_MARKER)
+                status, _, read_back = after.partition('\n')
+                if not marker:
+                    status = "exiftool did not finish writing"
+                elif not status.strip().isdigit():
+                    # Too old to expand ${status}: rely on the Error lines
+                    status = None
+                elif int(status):
+                    status = result.stderr.strip() or f"exiftool exited with status {status.strip()}"
+                else:
+                    status = None
+
+                metadata = {}
+                read_back = read_back.strip()
+                if read_back.startswith('{ready}'):
+                    read_back = read_back[len('{ready}'):].strip()
+                for item in json.loads(read_back) if read_back else []:
+                    file_path = by_source.get(os.path.normpath(item.get("SourceFile", "")))
+                    if file_path:
+                        metadata[file_path] = item
+
+                for file_path in chunk:
+                    missing = _missing_tags(tags, metadata.get(file_path, {}))
+                    if file_path in errors:
+                        error = errors[file_path]
+                    elif status and not errors:
+                        # Whole command failed (e.g. "Nothing to do."), not one file
+                        error = status
+                    elif missing:
+                        error = f"Tags not written: {', '.join(missing)}"
+                    else:
+                        error = None
+                    if error:
+                        results[file_path] = {"success": False, "error": error}
+                        failed = True
+                    else:
+                        results[file_path] = {
+                            "success": True,
+                            "metadata": metadata.get(file_path, {"error": "No metadata found"})
+                        }
+
+        committed = not failed
+    finally:
+        # exiftool replaced the files it wrote, the others are still the same file
+        written = []
+        for file_path, stat in backed_up.items():
+            try:
+                if not os.path.samestat(os.stat(file_path), stat):
+                    written.append(file_path)
+            except FileNotFoundError:
+                written.append(file_path)
+
+        for file_path in backed_up:
+            backup = batch_backup_path(file_path)
+            try:
+                if committed or file_path not in written:
+                    os.remove(backup)
+                else:
+                    os.replace(backup, file_path)
+            except OSError as e:
+                log_message("ERROR", "EXIFTOOL", f"Could not restore or remove batch backup: {str(e)}", file_path)
+
+    for file_path, _ in edits:
+        results.setdefault(file_path, {"success": False, "error": "Not attempted, another file failed"})
+
+    if not committed:
+        for result in results.values():
+            if result.pop("metadata", None) is not None:
+                result.update(success=False, error="Rolled back, another file failed")
+            result["rolled_back"] = True
+        log_message("ERROR", "EXIFTOOL", f"Batch write failed, restored {len(written)} files")
+        return False, results
+
+    for file_path in written:
+        invalidate_file(file_path)
+    log_message("SUCCESS", "EXIFTOOL", f"Batch wrote metadata to {len(results)} files")
+    return True, results
+
+# exiftool tags that repeat file_info or describe exiftool itself
+EXIFTOOL_FILE_TAGS = {
+    "SourceFile", "ExifToolVersion", "FileName", "Directory", "FileSize", "FileModifyDate", "FileAccessDate",
+    "FileInodeChangeDate", "FilePermissions", "FileType", "FileTypeExtension", "MIMEType",
+}
+
+def compact_metadata(metadata):
+    """Merge per-tool results into one document without the raw, duplicated tool output
+
+    Sections: file, tags (exiftool), image (identify), media (ffprobe + mediainfo),
+    archive (zipinfo), strings, errors ({tool: message}) and pipeline.
+    """
+    def usable(name):
+        result = metadata.get(name)
+        return result if isinstance(result, dict) and "error" not in result else None
+
+    file_info = metadata.get("file_info", {})
+    pipeline = metadata.get("_pipeline", {})
+    file_type = pipeline.get("file_type", {})
+    file_result = usable("file") or {}
+    compact = {
+        "file": {
+            "name": file_info.get("name"),
+            "size": file_info.get("size"),
+            "modified": file_info.get("modified"),
+            "mime_type": file_result.get("mime_type") or file_type.get("mime_type") or file_info.get("mime_type"),
+            "description": file_result.get("description") or file_type.get("description"),
+            "category": file_type.get("category"),
+        }
+    }
+
+    exiftool = usable("exiftool") or usable("pdf")
+    if exiftool:
+        compact["tags"] = {key: value for key, value in exiftool.items() if key not in EXIFTOOL_FILE_TAGS}
+    identify = usable("identify")
+    if identify:
+        compact["image"] = {key: value for key, value in identify.items() if key != "mode"}
+    if metadata.get("media"):
+        compact["media"] = metadata["media"]
+    zipinfo = usable("zipinfo")
+    if zipinfo:
+        compact["archive"] = zipinfo
+    strings = usable("strings")
+    if strings:
+        compact["strings"] = {
+            "total": strings.get("total_strings"),
+            "interesting": strings.get("interesting_strings"),
+            "complete": strings.get("complete"),
+        }
+
+    errors = {
+        name: result["error"] for name, result in metadata.items()
+        if name in EXTRACTORS and name not in EXTRACTOR_ALIASES and isinstance(result, dict) and "error" in result
+    }
+    if errors:
+        compact["errors"] = errors
+    compact["pipeline"] = {
+        "elapsed": pipeline.get("elapsed"),
+        "cached": pipeline.get("cached", False),
+        "timed_out": pipeline.get("timed_out", []),
+    }
+    return compact
+
+def project_fields(data, fields):
+    """Keep only the dotted paths in fields (e.g. "file.size", "tags.Artist") that exist in data"""
+    projected = {}
+    for field in fields:
+        parts = field.split('.')
+        value = data
+        for part in parts:
+            if not isinstance(value, dict) or part not in value:
+                break
+            value = value[part]
+        else:
+            target = projected
+            for part in parts[:-1]:
+                target = target.setdefault(part, {})
+            target[parts[-1]] = value
+    return projected
+
+def requested_view():
+    """(view, fields, format) from ?view=raw|compact, ?fields=a.b,c and ?format=json|msgpack"""
+    view = request.args.get('view', 'raw')
+    if view not in ('raw', 'compact'):
+        raise ValueError("view must be raw or compact")
+    fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
+
+    response_format = request.args.get('format')
+    if response_format is None:
+        # Negotiate among what the server can actually produce; JSON wins ties and */*
+        available = ['application/json'] + (['application/msgpack'] if msgpack is not None else [])
+        best = request.accept_mimetypes.best_match(available, default='application/json')
+        return view, fields, 'msgpack' if best == 'application/msgpack' else 'json'
+    if response_format not in ('json', 'msgpack'):
+        raise ValueError("format must be json or msgpack")
+    if response_format == 'msgpack' and msgpack is None:
+        raise ValueError("msgpack is not installed on the server")
+    return view, fields, response_format
+
+def shape_metadata(metadata, view, fields):
+    """Apply ?view= and ?fields= to a collected metadata document"""
+    if view == 'compact':
+        metadata = compact_metadata(metadata)
+    return project_fields(metadata, fields) if fields else metadata
+
+def metadata_response(data, response_format='json', status=200):
+    """Encode as JSON or msgpack, gzip-compressed when the client accepts it"""
+    if response_format == 'msgpack':
+        body, mimetype = msgpack.packb(data, use_bin_type=True), 'application/msgpack'
+    else:
+        body, mimetype = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 'application/json'
+
+    response = Response(body, status=status, mimetype=mimetype)
+    response.vary.add('Accept-Encoding')
+    if 'format' not in request.args:
+        response.vary.add('Accept')
+    # Small bodies are not worth the CPU
+    if len(body) >= 1024 and request.accept_encodings['gzip']:
+        response.set_data(gzip.compress(body, compresslevel=5))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+def requested_tools():
+    """Extractors named in ?tools=, or None to let routing decide"""
+    value = request.values.get('tools', '')
+    tools = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in tools if name not in EXTRACTORS]
+    if unknown:
+        raise ValueError(f"Unknown tools: {', '.join(unknown)}")
+    return tools or None
+
+# Query parameters passed to extractors: parameter -> [(tool, keyword argument)]
+EXTRACTOR_PARAMS = {
+    'zip_offset': [('zipinfo', 'offset')],
+    'zip_limit': [('zipinfo', 'limit')],
+    'deep': [('identify', 'deep'), ('ffprobe', 'deep'), ('mediainfo', 'deep')],
+}
+
+def requested_options():
+    """Per-extractor keyword arguments from query parameters such as ?zip_limit="""
+    options = {}
+    for param, targets in EXTRACTOR_PARAMS.items():
+        value = request.values.get(param, '')
+        if not value:
+            continue
+        if not value.isdigit():
+            raise ValueError(f"{param} must be a non-negative integer")
+        for tool_name, argument in targets:
+            options.setdefault(tool_name, {})[argument] = int(value)
+    return options
+
 @app.route('/')
 def index():
     """Main page"""
     log_message("INFO", "WEB", "Homepage accessed")
-    tools_status = {
-        'exiftool': check_tool('exiftool'),
-        'mediainfo': check_tool('mediainfo'),
-        'ffprobe': check_tool('ffprobe'),
-        'identify': check_tool('identify'),
-        'file': check_tool('file'),
-        'zipinfo': check_tool('zipinfo'),
-        'strings': check_tool('strings'),
-    }
+    tools_status = TOOL_REGISTRY.status()
     return render_template('index.html', tools_status=tools_status)
 
+def new_upload_path(original_name):
+    """Pick an unused (file_id, path) in the upload folder for an uploaded file"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_")
+    name = secure_filename(original_name) or "file"
+    filename = timestamp + name
+    counter = 1
+    while os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], filename)):
+        filename = f"{timestamp}{counter}_{name}"
+        counter += 1
+    return filename, os.path.join(app.config['UPLOAD_FOLDER'], filename)
+
+class HashingFile:
+    """Temporary file in the object store that hashes everything written to it"""
+
+    def __init__(self, folder):
+        fd, self.path = tempfile.mkstemp(dir=folder, prefix='.upload-')
+        self.file = os.fdopen(fd, 'w+b')
+        self.sha256 = hashlib.sha256()
+        self.stored = False
+
+    def write(self, data):
+        self.sha256.update(data)
+        return self.file.write(data)
+
+    def close(self):
+        self.file.close()
+        if not self.stored and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+class UploadRequest(Request):
+    """Request that streams uploaded files straight into the object store while hashing them"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingFile(app.config['OBJECT_FOLDER'])
+
+app.request_class = UploadRequest
+
+class StoreLock:
+    """Thread lock that is also an flock on the object store, so server processes take turns too"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._fd = None
+        self._pid = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        if fcntl is not None:
+            if self._pid != os.getpid():
+                # A descriptor inherited across fork shares its lock with the parent
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+                self._pid = os.getpid()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._lock.release()
+
+# Serializes linking to and removing objects, so a duplicate upload never links a deleted object
+_store_lock = StoreLock(os.path.join(app.config['OBJECT_FOLDER'], '.lock'))
+
+def object_path(digest):
+    return os.path.join(app.config['OBJECT_FOLDER'], digest[:2], digest)
+
+def store_upload(stream, original_name):
+    """Store an upload by content and link it into the upload folder
+
+    Returns (file_id, path, duplicate). A duplicate is linked to the existing object,
+    so it takes no extra space and its digest (and cached metadata) is already known.
+    """
+    if not isinstance(stream, HashingFile):
+        # Not parsed by UploadRequest, e.g. a zip member: copy it through the hasher
+        source, stream = stream, HashingFile(app.config['OBJECT_FOLDER'])
+        shutil.copyfileobj(source, stream, 1024 * 1024)
+
+    digest = stream.sha256.hexdigest()
+    target = object_path(digest)
+    try:
+        with _store_lock:
+            duplicate = os.path.exists(target)
+            if not duplicate:
+                stream.flush()
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(stream.path, target)
+                stream.stored = True
+
+            file_id, filepath = new_upload_path(original_name)
+            try:
+                os.link(target, filepath)
+            except OSError:
+                # Filesystems without hardlinks (e.g. Android shared storage) get a copy
+                shutil.copyfile(target, filepath)
+    finally:
+        stream.close()
+
+    remember_digest(filepath, digest)
+    STORAGE.add(file_id, filepath)
+    return file_id, filepath, duplicate
+
+def release_object(digest):
+    """Remove a stored object and its cached metadata once no upload links to it"""
+    target = object_path(digest)
+    with _store_lock:
+        try:
+            if os.stat(target).st_nlink > 1:
+                return
+            os.remove(target)
+        except FileNotFoundError:
+            pass
+    METADATA_CACHE.invalidate(digest)
+
+def remove_upload(filepath):
+    """Delete an upload and everything derived from it: object link, cached metadata, index entry"""
+    if os.stat(filepath).st_nlink > 1:
+        # Linked to a stored object: make sure its digest is known so the object can be released
+        file_digest(filepath)
+    os.remove(filepath)
+    invalidate_file(filepath)
+
+class StorageManager:
+    """Keeps the upload folder within a byte quota and removes uploads nobody accessed for a TTL
+
+    An in-memory index (file_id -> inode, size, last access) answers lookups without touching
+    the directory. Last access is also stored as the file's atime, so it survives restarts and
+    is shared by every server process; the janitor re-reads it from disk on each sweep.
+    Hardlinked duplicates share an inode and are counted once. Uploads that are pinned by a
+    request or belong to an unfinished job are never removed.
+    """
+
+    # Evict down to this share of the quota, so one new upload doesn't trigger another sweep
+    LOW_WATER = 0.9
+
+    def __init__(self, folder, quota, ttl, interval):
+        self.folder = folder
+        self.quota = quota
+        self.ttl = ttl
+        self.interval = interval
+        self.used = 0
+        self.evicted = 0
+        self._files = {}
+        self._inodes = {}
+        self._pins = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def _add(self, file_id, stat, accessed):
+        self._drop(file_id)
+        self._files[file_id] = (stat.st_ino, stat.st_size, accessed)
+        links = self._inodes.setdefault(stat.st_ino, [0, stat.st_size])
+        if links[0] == 0:
+            self.used += stat.st_size
+        links[0] += 1
+
+    def _drop(self, file_id):
+        entry = self._files.pop(file_id, None)
+        if entry is None:
+            return
+        links = self._inodes[entry[0]]
+        links[0] -= 1
+        if links[0] == 0:
+            self.used -= links[1]
+            del self._inodes[entry[0]]
+
+    def scan(self):
+        """Rebuild the index from the upload folder"""
+        entries = []
+        with os.scandir(self.folder) as it:
+            for entry in it:
+                if entry.name.startswith('.') or not entry.is_file(follow_symlinks=False):
+                    continue
+                entries.append((entry.name, entry.stat(follow_symlinks=False)))
+        with self._lock:
+            self._files.clear()
+            self._inodes.clear()
+            self.used = 0
+            for file_id, stat in entries:
+                self._add(file_id, stat, stat.st_atime)
+
+    def add(self, file_id, path):
+        """Record a new or changed upload as just accessed"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return self.forget(file_id)
+        now = time.time()
+        with self._lock:
+            self._add(file_id, stat, now)
+            over = self.quota is not None and self.used > self.quota
+        try:
+            self._set_atime(path, stat, now)
+        except FileNotFoundError:
+            return self.forget(file_id)
+        if over:
+            self._wake.set()
+
+    def forget(self, file_id):
+        with self._lock:
+            self._drop(file_id)
+
+    def lookup(self, file_id):
+        """Path of an upload, marking it accessed, or None when it doesn't exist"""
+        path = os.path.join(self.folder, file_id)
+        if self.touch(file_id):
+            return path
+        # Stored by another server process since our last sweep, or already gone
+        if not os.path.isfile(path):
+            return None
+        self.add(file_id, path)
+        return path
+
+    def touch(self, file_id):
+        """Mark a known upload accessed; False when it is not indexed or no longer on disk"""
+        path = os.path.join(self.folder, file_id)
+        now = time.time()
+        with self._lock:
+            entry = self._files.get(file_id)
+            if entry is None:
+                return False
+            self._files[file_id] = entry[:2] + (now,)
+        try:
+            self._set_atime(path, os.stat(path), now)
+        except FileNotFoundError:
+            # Deleted or evicted by another process
+            self.forget(file_id)
+            return False
+        return True
+
+    @staticmethod
+    def _set_atime(path, stat, now):
+        # mtime is left alone, it is part of the digest memo's signature
+        os.utime(path, ns=(int(now * 1e9), stat.st_mtime_ns))
+
+    @contextlib.contextmanager
+    def pinned(self, file_ids):
+        """Keep these uploads from being evicted while the block runs"""
+        file_ids = [file_id for file_id in file_ids if file_id]
+        with self._lock:
+            for file_id in file_ids:
+                self._pins[file_id] = self._pins.get(file_id, 0) + 1
+        for file_id in file_ids:
+            self.touch(file_id)
+        try:
+            yield
+        finally:
+            with self._lock:
+                for file_id in file_ids:
+                    self._pins[file_id] -= 1
+                    if not self._pins[file_id]:
+                        del self._pins[file_id]
+
+    def sweep(self):
+        """Remove expired uploads, then the least recently used ones while over quota
+
+        Returns (files removed, bytes freed).
+        """
+        self.scan()
+        in_use = JOB_QUEUE.active_files()
+        now = time.time()
+        with self._lock:
+            candidates = sorted(
+                (accessed, file_id) for file_id, (_, _, accessed) in self._files.items()
+                if file_id not in self._pins and file_id not in in_use
+            )
+            used = self.used
+        evicting = self.quota is not None and used > self.quota
+
+        removed = freed = 0
+        for accessed, file_id in candidates:
+            expired = self.ttl is not None and now - accessed > self.ttl
+            if not expired and not (evicting and used > self.quota * self.LOW_WATER):
+                # Oldest first, so nothing after this one is expired either
+                break
+            with self._lock:
+                entry = self._files.get(file_id)
+                if entry is None or file_id in self._pins:
+                    continue
+                last_link = self._inodes[entry[0]][0] == 1
+            path = os.path.join(self.folder, file_id)
+            try:
+                remove_upload(path)
+            except FileNotFoundError:
+                self.forget(file_id)
+                continue
+            except OSError as e:
+                log_message("ERROR", "STORAGE", f"Could not remove upload: {str(e)}", path)
+                continue
+            if last_link:
+                used -= entry[1]
+                freed += entry[1]
+            removed += 1
+            log_message("INFO", "STORAGE", "Expired upload removed" if expired else "Upload evicted for quota", path)
+
+        self.evicted += removed
+        if removed:
+            log_message("SUCCESS", "STORAGE", f"Removed {removed} uploads, freed {format_size(freed)}")
+        return removed, freed
+
+    def start(self):
+        """Index the upload folder and start the janitor thread"""
+        self.scan()
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._janitor, name='storage-janitor', daemon=True)
+            self._thread.start()
+
+    def _janitor(self):
+        lock_path = os.path.join(self.folder, '.janitor.lock')
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                with open(lock_path, 'a') as lock_file:
+                    if fcntl is not None:
+                        try:
+                            # Several server processes: only one sweeps at a time
+                            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        except BlockingIOError:
+                            continue
+                    self.sweep()
+            except Exception as e:
+                log_message("ERROR", "STORAGE", f"Janitor sweep failed: {str(e)}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "bytes": self.used,
+                "quota": self.quota,
+                "ttl": self.ttl,
+                "pinned": len(self._pins),
+                "evicted": self.evicted,
+            }
+
+STORAGE = StorageManager(app.config['UPLOAD_FOLDER'], app.config['STORAGE_QUOTA'], app.config['UPLOAD_TTL'],
+                         app.config['JANITOR_INTERVAL'])
+METRICS.gauge("metadata_storage_bytes", "Bytes used by uploads (duplicates counted once)", lambda: STORAGE.used)
+METRICS.gauge("metadata_storage_files", "Uploads in the upload folder", lambda: len(STORAGE._files))
+METRICS.gauge("metadata_storage_evicted_total", "Uploads removed by the janitor", lambda: STORAGE.evicted,
+              kind="counter")
+
+def save_zip_members(archive, max_files, saved):
+    """Store the regular files inside an uploaded zip as separate uploads, appending to saved"""
+    with zipfile.ZipFile(archive) as zf:
+        members = [info for info in zf.infolist() if not info.is_dir()]
+        if len(members) > max_files:
+            raise ValueError(f"Archive has {len(members)} files, the limit is {max_files}")
+        if sum(info.file_size for info in members) > app.config['MAX_CONTENT_LENGTH']:
+            raise ValueError("Archive expands beyond the upload size limit")
+
+        for info in members:
+            with zf.open(info) as src:
+                file_id, filepath, _ = store_upload(src, os.path.basename(info.filename))
+            saved.append((file_id, filepath))
+
+class RemoteError(Exception):
+    """A remote object could not be fetched; status is the HTTP status to answer with"""
+
+    def __init__(self, message, status=502):
+        super().__init__(message)
+        self.status = status
+
+METRICS.describe("metadata_remote_bytes_total", "counter", "Bytes fetched from remote URLs by mode (range, full)")
+
+def check_remote_host(host):
+    """Refuse hosts that resolve to loopback, private or link-local addresses unless REMOTE_ALLOW_PRIVATE
+
+    Returns the checked address to connect to, so a second DNS lookup cannot swap in
+    another one, or None when private addresses are allowed.
+    """
+    if app.config['REMOTE_ALLOW_PRIVATE']:
+        return None
+    try:
+        addresses = list(dict.fromkeys(info[4][0] for info in socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)))
+    except socket.gaierror as e:
+        raise RemoteError(f"Cannot resolve {host}: {str(e)}", 400)
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split('%', 1)[0])
+        if not ip.is_global:
+            raise RemoteError(f"{host} resolves to a non-public address", 400)
+    return addresses[0]
+
+class HTTPPool:
+    """Keep-alive HTTP(S) connections reused across requests, a few idle ones per host"""
+
+    def __init__(self, max_idle, timeout):
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _connect(self, key, address=None):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        scheme, host, port = key
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        connection = connection_class(host, port, timeout=self.timeout)
+        if address is not None:
+            # Connect to the checked address; Host header, SNI and certificate still use host
+            connection._create_connection = lambda target, *args: socket.create_connection((address, target[1]), *args)
+        return connection, False
+
+    def _release(self, key, connection):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def request(self, method, url, headers=None, write=None, limit=None, redirects=5):
+        """Send one request, following redirects; returns (status, headers, body)
+
+        The body goes to write(chunk) when given (body is then None). More than limit
+        bytes of body raises RemoteError.
+        """
+        for _ in range(redirects + 1):
+            parts = urlsplit(url)
+            if parts.scheme not in ('http', 'https') or not parts.hostname:
+                raise RemoteError(f"Unsupported URL: {url}", 400)
+            address = check_remote_host(parts.hostname)
+            key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80))
+            target = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+
+            connection, response = self._send(key, method, target, headers or {}, address)
+
+            try:
+                if response.status in (301, 302, 303, 307, 308) and response.getheader('Location'):
+                    response.read()
+                    url = urljoin(url, response.getheader('Location'))
+                    continue
+                body = self._read_body(response, write, limit)
+            except BaseException:
+                connection.close()
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                self._release(key, connection)
+            return response.status, {name.lower(): value for name, value in response.getheaders()}, body
+        raise RemoteError("Too many redirects")
+
+    def _send(self, key, method, target, headers, address=None):
+        """(connection, response) for one request, retrying once if a reused connection went stale"""
+        while True:
+            connection, reused = self._connect(key, address)
+            try:
+                connection.request(method, target, headers=headers)
+                return connection, connection.getresponse()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError) as e:
+                connection.close()
+                if not reused:
+                    raise RemoteError(f"Request to {key[1]} failed: {str(e)}")
+                # The server closed an idle keep-alive connection, try the next one or a new one
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                raise RemoteError(f"Request to {key[1]} failed: {str(e)}")
+
+    @staticmethod
+    def _read_body(response, write, limit):
+        chunks, received = [], 0
+        while True:
+            chunk = response.read(1024 * 1024)
+            if not chunk:
+                break
+            received += len(chunk)
+            if limit is not None and received > limit:
+                raise RemoteError(f"Remote response is larger than {format_size(limit)}", 413)
+            if write is not None:
+                write(chunk)
+            else:
+                chunks.append(chunk)
+        return None if write is not None else b''.join(chunks)
+
+REMOTE_POOL = HTTPPool(app.config['REMOTE_POOL_SIZE'], app.config['REMOTE_TIMEOUT'])
+
+def s3_request(url, headers, payload_hash='UNSIGNED-PAYLOAD', now=None):
+    """HTTP URL and headers, signed with AWS Signature V4, for a GET of s3://bucket/key on S3_ENDPOINT"""
+    if not app.config['S3_ENDPOINT']:
+        raise RemoteError("S3_ENDPOINT is not configured", 400)
+    parts = urlsplit(url)
+    path = '/' + quote(parts.netloc) + '/' + quote(unquote(parts.path.lstrip('/')))
+    endpoint = app.config['S3_ENDPOINT'].rstrip('/')
+    if not app.config['S3_ACCESS_KEY']:
+        return endpoint + path, headers
+
+    now = now or datetime.now(timezone.utc)
+    amz_date = now.strftime('%Y%m%dT%H%M%SZ')
+    scope = f"{now.strftime('%Y%m%d')}/{app.config['S3_REGION']}/s3/aws4_request"
+    signed_headers = {name.lower(): str(value).strip() for name, value in headers.items()}
+    signed_headers.update({'host': urlsplit(endpoint).netloc, 'x-amz-content-sha256': payload_hash,
+                           'x-amz-date': amz_date})
+    names = sorted(signed_headers)
+    canonical = '\n'.join([
+        'GET', path, '',
+        ''.join(f"{name}:{signed_headers[name]}\n" for name in names),
+        ';'.join(names), payload_hash,
+    ])
+    to_sign = '\n'.join(['AWS4-HMAC-SHA256', amz_date, scope, hashlib.sha256(canonical.encode()).hexdigest()])
+
+    key = ('AWS4' + app.config['S3_SECRET_KEY']).encode()
+    for part in scope.split('/'):
+        key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+    signature = hmac.new(key, to_sign.encode(), hashlib.sha256).hexdigest()
+
+    del signed_headers['host']  # http.client sends it
+    signed_headers['authorization'] = (
+        f"AWS4-HMAC-SHA256 Credential={app.config['S3_ACCESS_KEY']}/{scope}, "
+        f"SignedHeaders={';'.join(names)}, Signature={signature}"
+    )
+    return endpoint + path, signed_headers
+
+class RemoteFile:
+    """Sparse local copy of a remote object, filled in with only the byte ranges that get read"""
+
+    def __init__(self, url, path):
+        self.url = url
+        self.path = path
+        self.size = None
+        self.content_type = None
+        self.ranges = []
+        self.fetched = 0
+
+    def _request(self, headers, write=None, limit=None):
+        url = self.url
+        if url.startswith('s3://'):
+            # Signatures expire, sign every request
+            url, headers = s3_request(url, headers)
+        status, response_headers, body = REMOTE_POOL.request('GET', url, headers, write, limit)
+        if status == 404:
+            raise RemoteError("Remote object not found", 404)
+        if status >= 400:
+            raise RemoteError(f"Remote server answered HTTP {status}")
+        return status, response_headers, body
+
+    def open(self):
+        """Fetch the head of the object, or all of it when it is small or ranges are unsupported
+
+        Returns True when the whole object is now local.
+        """
+        head = app.config['REMOTE_HEAD_BYTES']
+        with open(self.path, 'wb') as f:
+            status, headers, _ = self._request(
+                {'Range': f"bytes=0-{head - 1}"}, write=f.write, limit=app.config['MAX_CONTENT_LENGTH']
+            )
+            self.content_type = headers.get('content-type')
+            received = f.tell()
+
+        match = re.match(r'bytes \d+-\d+/(\d+)', headers.get('content-range', ''))
+        if status != 206 or not match:
+            # Ranges not supported: the whole body was sent
+            self.size = received
+            self._fetched(0, received, "full")
+            return True
+
+        self.size = int(match.group(1))
+        self._fetched(0, received, "range")
+        if self.size <= app.config['REMOTE_FULL_FETCH']:
+            self.read(received, self.size - received)
+            return True
+        with open(self.path, 'r+b') as f:
+            f.truncate(self.size)
+        return False
+
+    def _fetched(self, start, length, mode):
+        if length:
+            self.ranges.append([start, start + length - 1])
+            self.fetched += length
+            METRICS.inc("metadata_remote_bytes_total", length, mode=mode)
+
+    def missing(self, start, end):
+        """Sub-ranges of [start, end) not fetched yet"""
+        gaps, position = [], start
+        for first, last in sorted(self.ranges):
+            if last < position or first >= end:
+                continue
+            if first > position:
+                gaps.append((position, first))
+            position = max(position, last + 1)
+        if position < end:
+            gaps.append((position, end))
+        return gaps
+
+    def read(self, start, length):
+        """Bytes [start, start + length) of the object, fetching whatever is missing"""
+        start = max(0, start)
+        end = min(self.size, start + length)
+        for first, last in self.missing(start, end):
+            if self.fetched + (last - first) > app.config['REMOTE_MAX_FETCH']:
+                raise RemoteError(f"Metadata needs more than {format_size(app.config['REMOTE_MAX_FETCH'])} "
+                                  f"of the remote file", 413)
+            _, _, body = self._request({'Range': f"bytes={first}-{last - 1}"}, limit=last - first)
+            with open(self.path, 'r+b') as f:
+                f.seek(first)
+                f.write(body)
+            self._fetched(first, len(body), "range")
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            return f.read(end - start)
+
+def _fetch_zip_directory(remote):
+    """Fetch the end of central directory record and the central directory it points to"""
+    tail_start = max(0, remote.size - 65557)
+    tail = remote.read(tail_start, remote.size - tail_start)
+    end = tail.rfind(b'PK\x05\x06')
+    if end < 0 or len(tail) < end + 22:
+        return
+    cd_size, cd_offset = struct.unpack('<II', tail[end + 12:end + 20])
+    locator = tail[end - 20:end] if end >= 20 else b''
+    if locator[:4] == b'PK\x06\x07':
+        # ZIP64: the real sizes are in the zip64 end of central directory record
+        (record_offset,) = struct.unpack('<Q', locator[8:16])
+        record = remote.read(record_offset, 56)
+        if record[:4] == b'PK\x06\x06':
+            cd_size, cd_offset = struct.unpack('<QQ', record[40:56])
+    remote.read(cd_offset, cd_size)
+
+def _fetch_mp4_boxes(remote):
+    """Walk the top-level boxes and fetch every one except the media data"""
+    position, boxes = 0, 0
+    while position + 8 <= remote.size and boxes < 1000:
+        header = remote.read(position, 16)
+        size, kind = struct.unpack('>I4s', header[:8])
+        if size == 1:
+            (size,) = struct.unpack('>Q', header[8:16])
+        elif size == 0:
+            size = remote.size - position
+        if size < 8:
+            return
+        if kind not in (b'mdat', b'free', b'skip', b'wide'):
+            remote.read(position, size)
+        position += size
+        boxes += 1
+
+def fetch_remote_metadata_ranges(remote):
+    """Fetch the parts of a remote object the extractors read, by format
+
+    Zip: central directory. MP4/MOV: every top-level box but mdat (moov may be at the
+    end). Anything else: the head and REMOTE_TAIL_BYTES of the end (PDF trailer, PNG text).
+    """
+    head = remote.read(0, 12)
+    if head[4:8] == b'ftyp':
+        _fetch_mp4_boxes(remote)
+    elif head[:4] == b'PK\x03\x04':
+        _fetch_zip_directory(remote)
+    else:
+        tail = app.config['REMOTE_TAIL_BYTES']
+        remote.read(remote.size - tail, tail)
+
+# Extractors that scan the whole file and would only see the holes of a partial download
+REMOTE_PARTIAL_SKIP = {"strings"}
+
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
     """Handle file upload"""
@@ -398,72 +3603,180 @@ def upload_file():
         return jsonify({"error": "No file selected"}), 400
 
     try:
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_")
-        filename = timestamp + filename
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        tools = requested_tools()
+        options = requested_options()
+        view, fields, response_format = requested_view()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        log_message("INFO", "UPLOAD", f"Uploading file: {file.filename}")
+        # The body was already streamed to the object store while the form was parsed
+        filename, filepath, duplicate = store_upload(file.stream, file.filename)
         
-        log_message("INFO", "UPLOAD", f"Uploading file: {filename}")
-        file.save(filepath)
+        log_message("SUCCESS", "UPLOAD", f"File saved: {filename}" + (" (duplicate content)" if duplicate else ""))
         
-        log_message("SUCCESS", "UPLOAD", f"File saved: {filename}")
+        if request.values.get('defer') == '1':
+            # Client will follow up with /api/metadata/<file_id>/stream
+            return jsonify({
+                "success": True,
+                "file_id": filename,
+                "duplicate": duplicate,
+                "file_info": get_file_info(filepath)
+            })
         
-        file_info = get_file_info(filepath)
-        all_metadata = {
-            "file_info": file_info,
-            "exiftool": get_exiftool_metadata(filepath),
-            "mediainfo": get_mediainfo_metadata(filepath),
-            "ffprobe": get_ffprobe_metadata(filepath),
-            "pdf": get_pdf_metadata(filepath),
-            "identify": get_identify_metadata(filepath),
-            "file": get_file_type_metadata(filepath),
-            "zipinfo": get_zipinfo_metadata(filepath),
-            "strings": get_strings_metadata(filepath),
-        }
+        # Known content is answered from the metadata cache without running the tools
+        all_metadata = collect_metadata(filepath, tools, options)
         
         log_message("SUCCESS", "PROCESSING", f"Completed metadata extraction for {filename}")
         
-        return jsonify({
+        return metadata_response({
             "success": True,
             "file_id": filename,
-            "metadata": all_metadata
-        })
+            "duplicate": duplicate,
+            "metadata": shape_metadata(all_metadata, view, fields)
+        }, response_format)
     except Exception as e:
         log_message("ERROR", "UPLOAD", f"Upload failed: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/analyze-url', methods=['POST'])
+def analyze_url():
+    """Extract metadata from an HTTP(S) or s3:// URL, fetching only the byte ranges needed"""
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "JSON body must be an object"}), 400
+    url = data.get('url') or request.values.get('url') or ''
+    if not isinstance(url, str):
+        return jsonify({"error": "url must be a string"}), 400
+    url = url.strip()
+    if not url:
+        return jsonify({"error": "No url provided"}), 400
+    if urlsplit(url).scheme not in ('http', 'https', 's3'):
+        return jsonify({"error": "Only http, https and s3 URLs are supported"}), 400
+
+    try:
+        tools = requested_tools()
+        options = requested_options()
+        view, fields, response_format = requested_view()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    workdir = os.path.join(app.config['UPLOAD_FOLDER'], '.remote')
+    os.makedirs(workdir, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=workdir, prefix='remote-')
+    os.close(fd)
+    name = os.path.basename(unquote(urlsplit(url).path)) or "remote"
+    remote = RemoteFile(url, path)
+    try:
+        log_message("INFO", "REMOTE", f"Fetching metadata ranges of: {url}")
+        complete = remote.open()
+        file_id = duplicate = None
+        if complete:
+            # Small enough to keep: it becomes a normal upload, cached and searchable
+            with open(path, 'rb') as f:
+                file_id, filepath, duplicate = store_upload(f, name)
+            all_metadata = collect_metadata(filepath, tools, options)
+        else:
+            fetch_remote_metadata_ranges(remote)
+            file_type = sniff_file_type(path)
+            if tools is None:
+                tools = [
+                    tool for tool in EXTRACTOR_ROUTES
+                    if tool not in REMOTE_PARTIAL_SKIP and extractor_applies(tool, file_type["category"])
+                ]
+            # Not cached: the digest of a sparse copy would mean reading every hole
+            all_metadata = run_extractors(path, tools, options=options, mime_type=file_type["mime_type"],
+                                          fallbacks=EXTRACTOR_FALLBACKS)
+            all_metadata["file_info"] = dict(get_file_info(path), name=name)
+            all_metadata["_pipeline"]["file_type"] = file_type
+            all_metadata = order_results(all_metadata)
+        log_message("SUCCESS", "REMOTE",
+                    f"Analyzed {url}: fetched {format_size(remote.fetched)} of {format_size(remote.size)}")
+    except RemoteError as e:
+        log_message("ERROR", "REMOTE", f"Fetching {url} failed: {str(e)}")
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        log_message("ERROR", "REMOTE", f"Remote analysis failed: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+    finally:
+        os.remove(path)
+
+    return metadata_response({
+        "success": True,
+        "file_id": file_id,
+        "duplicate": duplicate,
+        "source": {
+            "url": url,
+            "size": remote.size,
+            "content_type": remote.content_type,
+            "fetched_bytes": remote.fetched,
+            "ranges": sorted(remote.ranges),
+            "complete": complete,
+        },
+        "metadata": shape_metadata(all_metadata, view, fields)
+    }, response_format)
+
 @app.route('/api/metadata/<file_id>', methods=['GET'])
 def get_metadata(file_id):
     """Get metadata for uploaded file from all tools"""
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(file_id))
+    filepath = STORAGE.lookup(secure_filename(file_id))
 
-    if not os.path.exists(filepath):
+    if filepath is None:
         return jsonify({"error": "File not found"}), 404
 
+    try:
+        tools = requested_tools()
+        options = requested_options()
+        view, fields, response_format = requested_view()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     log_message("INFO", "METADATA", f"Fetching metadata for: {file_id}")
     
-    file_info = get_file_info(filepath)
-    all_metadata = {
-        "file_info": file_info,
-        "exiftool": get_exiftool_metadata(filepath),
-        "mediainfo": get_mediainfo_metadata(filepath),
-        "ffprobe": get_ffprobe_metadata(filepath),
-        "pdf": get_pdf_metadata(filepath),
-        "identify": get_identify_metadata(filepath),
-        "file": get_file_type_metadata(filepath),
-        "zipinfo": get_zipinfo_metadata(filepath),
-        "strings": get_strings_metadata(filepath),
-    }
+    all_metadata = collect_metadata(filepath, tools, options)
     
     log_message("SUCCESS", "METADATA", f"Metadata retrieved for: {file_id}")
-    return jsonify(all_metadata)
+    return metadata_response(shape_metadata(all_metadata, view, fields), response_format)
+
+@app.route('/api/metadata/<file_id>/stream', methods=['GET'])
+def stream_metadata(file_id):
+    """Stream each tool's metadata as a Server-Sent Event as soon as it is ready"""
+    filepath = STORAGE.lookup(secure_filename(file_id))
+
+    if filepath is None:
+        return jsonify({"error": "File not found"}), 404
+
+    try:
+        tools = requested_tools()
+        options = requested_options()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    log_message("INFO", "METADATA", f"Streaming metadata for: {file_id}")
+
+    def events():
+        for name, data in iter_metadata(filepath, tools, options):
+            if name == "_pipeline":
+                yield f"event: done\ndata: {json.dumps(data)}\n\n"
+            else:
+                yield f"event: tool\ndata: {json.dumps({'tool': name, 'data': data})}\n\n"
+        log_message("SUCCESS", "METADATA", f"Metadata stream finished for: {file_id}")
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.route('/api/metadata/<file_id>', methods=['POST'])
 def update_metadata(file_id):
     """Update metadata for file"""
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(file_id))
+    filepath = STORAGE.lookup(secure_filename(file_id))
 
-    if not os.path.exists(filepath):
+    if filepath is None:
         return jsonify({"error": "File not found"}), 404
 
     try:
@@ -483,10 +3796,11 @@ def update_metadata(file_id):
             log_message("ERROR", "UPDATE", "No valid metadata fields provided")
             return jsonify({"success": False, "error": "No valid metadata fields provided"}), 400
         
-        result = add_metadata(filepath, clean_metadata)
-        if result.get('success'):
+        with STORAGE.pinned([secure_filename(file_id)]):
+            result = add_metadata(filepath, clean_metadata)
             # Get updated metadata
-            updated_metadata = get_exiftool_metadata(filepath)
+            updated_metadata = get_exiftool_metadata(filepath) if result.get('success') else None
+        if result.get('success'):
             log_message("SUCCESS", "UPDATE", f"Metadata updated successfully for: {file_id}")
             return jsonify({
                 "success": True,
@@ -500,12 +3814,130 @@ def update_metadata(file_id):
         log_message("ERROR", "UPDATE", f"Metadata update exception: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/metadata/batch', methods=['POST'])
+def update_metadata_batch():
+    """Write one tag set, or a tag set per file, to many files; all files change or none do"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"success": False, "error": "Request body must be a JSON object"}), 400
+    shared = data.get('metadata') or {}
+    per_file = data.get('files') or {}
+    file_ids = data.get('file_ids') or []
+    if not isinstance(shared, dict):
+        return jsonify({"success": False, "error": "metadata must be an object of tags"}), 400
+    if not isinstance(per_file, dict) or not all(isinstance(tags, dict) for tags in per_file.values()):
+        return jsonify({"success": False, "error": "files must map each file_id to an object of tags"}), 400
+    if not isinstance(file_ids, list) or not all(isinstance(file_id, str) for file_id in file_ids):
+        return jsonify({"success": False, "error": "file_ids must be a list of strings"}), 400
+    file_ids = list(dict.fromkeys(file_ids))
+    file_ids += [file_id for file_id in per_file if file_id not in file_ids]
+
+    if not file_ids:
+        return jsonify({"success": False, "error": "No file_ids provided"}), 400
+    if len(file_ids) > app.config['BATCH_WRITE_MAX_FILES']:
+        return jsonify({"success": False, "error": f"Too many files, the limit is {app.config['BATCH_WRITE_MAX_FILES']}"}), 400
+
+    edits = []
+    paths = {}
+    missing = []
+    for file_id in file_ids:
+        filepath = STORAGE.lookup(secure_filename(file_id))
+        if filepath is None:
+            missing.append(file_id)
+            continue
+
+        tags = {}
+        for key, value in dict(shared, **per_file.get(file_id, {})).items():
+            clean_key = validate_metadata_key(key)
+            if clean_key:
+                tags[clean_key] = value
+        if not tags:
+            return jsonify({"success": False, "error": f"No valid metadata fields provided for {file_id}"}), 400
+        edits.append((filepath, tags))
+        paths[filepath] = file_id
+
+    if missing:
+        return jsonify({"success": False, "error": "File not found", "missing": missing}), 404
+
+    log_message("INFO", "UPDATE", f"Batch updating metadata for {len(edits)} files")
+    try:
+        with STORAGE.pinned([os.path.basename(filepath) for filepath in paths]):
+            success, results = write_metadata_batch(edits)
+    except Exception as e:
+        log_message("ERROR", "UPDATE", f"Batch metadata update exception: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+    return jsonify({
+        "success": success,
+        "files": {paths[file_path]: result for file_path, result in results.items()}
+    }), 200 if success else 400
+
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    """Queue many files (or the contents of a zip) for background metadata extraction"""
+    uploads = [f for f in request.files.getlist('files') + request.files.getlist('file') if f.filename]
+    archives = [f for f in request.files.getlist('archive') if f.filename]
+    if not uploads and not archives:
+        return jsonify({"error": "No files provided"}), 400
+
+    try:
+        tools = requested_tools()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Refuse before writing anything to disk
+    if JOB_QUEUE.closing:
+        return jsonify({"error": "Server is shutting down"}), 503
+    if JOB_QUEUE.full():
+        return jsonify({"error": "Job queue is full, try again later"}), 429
+
+    max_files = app.config['JOB_MAX_FILES']
+    if len(uploads) > max_files:
+        return jsonify({"error": f"Too many files, the limit is {max_files}"}), 400
+
+    saved = []
+    try:
+        for upload in uploads:
+            file_id, filepath, _ = store_upload(upload.stream, upload.filename)
+            saved.append((file_id, filepath))
+        for archive in archives:
+            save_zip_members(archive, max_files - len(saved), saved)
+        job_id = JOB_QUEUE.submit(saved, tools)
+    except Exception as e:
+        for _, filepath in saved:
+            if os.path.exists(filepath):
+                os.remove(filepath)
+                invalidate_file(filepath)
+        if isinstance(e, queue.Full) and JOB_QUEUE.closing:
+            return jsonify({"error": "Server is shutting down"}), 503
+        if isinstance(e, queue.Full):
+            return jsonify({"error": "Job queue is full, try again later"}), 429
+        if isinstance(e, (ValueError, zipfile.BadZipFile)):
+            return jsonify({"error": str(e)}), 400
+        log_message("ERROR", "JOBS", f"Job creation failed: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+    return jsonify({
+        "success": True,
+        "job_id": job_id,
+        "files": [file_id for file_id, _ in saved],
+        "status_url": f"/api/jobs/{job_id}"
+    }), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Progress and results of a queued job"""
+    job = JOB_QUEUE.get(job_id, with_results=request.args.get('results') != '0')
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
 @app.route('/api/download/<file_id>', methods=['GET'])
 def download_file(file_id):
     """Download file"""
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(file_id))
+    filepath = STORAGE.lookup(secure_filename(file_id))
 
-    if not os.path.exists(filepath):
+    if filepath is None:
         return jsonify({"error": "File not found"}), 404
 
     log_message("INFO", "DOWNLOAD", f"Downloading file: {file_id}")
@@ -514,14 +3946,14 @@ def download_file(file_id):
 @app.route('/api/delete/<file_id>', methods=['DELETE'])
 def delete_file(file_id):
     """Delete uploaded file"""
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(file_id))
+    filepath = STORAGE.lookup(secure_filename(file_id))
 
-    if not os.path.exists(filepath):
+    if filepath is None:
         return jsonify({"error": "File not found"}), 404
 
     try:
         log_message("INFO", "DELETE", f"Deleting file: {file_id}")
-        os.remove(filepath)
+        remove_upload(filepath)
         log_message("SUCCESS", "DELETE", f"File deleted: {file_id}")
         return jsonify({"success": True, "message": "File deleted successfully"})
     except Exception as e:
@@ -532,16 +3964,44 @@ def delete_file(file_id):
 def tools_status():
     """Get status of all available tools"""
     log_message("INFO", "TOOLS", "Checking tools status")
-    status = {
-        'exiftool': check_tool('exiftool'),
-        'mediainfo': check_tool('mediainfo'),
-        'ffprobe': check_tool('ffprobe'),
-        'identify': check_tool('identify'),
-        'file': check_tool('file'),
-        'zipinfo': check_tool('zipinfo'),
-        'strings': check_tool('strings'),
-    }
-    return jsonify(status)
+    if request.args.get('verbose') == '1':
+        return jsonify(TOOL_REGISTRY.info())
+    return jsonify(TOOL_REGISTRY.status())
+
+@app.route('/api/storage', methods=['GET'])
+def storage_status():
+    """Upload folder usage against the quota and TTL"""
+    return jsonify(STORAGE.stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Extractor timings, cache and queue statistics in the Prometheus text format"""
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/search', methods=['GET'])
+def search_metadata():
+    """Find uploaded files by metadata fields or full text, e.g. ?q=Model="iPhone 12" has:GPSLatitude"""
+    if SEARCH_INDEX is None:
+        return jsonify({"error": "Search index is disabled"}), 404
+
+    started = time.monotonic()
+    try:
+        limit = min(int(request.args.get('limit', 50)), 1000)
+        offset = int(request.args.get('offset', 0))
+        if limit < 1 or offset < 0:
+            raise ValueError("limit and offset must be positive")
+        results = SEARCH_INDEX.search(request.args.get('q', ''), limit, offset)
+    except (ValueError, sqlite3.OperationalError) as e:
+        return jsonify({"error": f"Invalid search: {str(e)}"}), 400
+
+    log_message("INFO", "SEARCH", f"{len(results)} results for: {request.args.get('q', '')}")
+    return jsonify({
+        "results": results,
+        "count": len(results),
+        "offset": offset,
+        "limit": limit,
+        "elapsed_ms": round((time.monotonic() - started) * 1000, 2)
+    })
 
 @app.route('/api/supported-fields', methods=['GET'])
 def get_supported_fields():
@@ -556,6 +4016,223 @@ def get_supported_fields():
     else:
         return jsonify({"fields": supported["common"]})
 
+def _scan_worker_init(quiet):
+    """Send worker logs to stderr so they never mix with the JSON Lines output"""
+    global LOG_OUTPUT
+    LOG_OUTPUT = None if quiet else sys.stderr
+
+def _scan_chunk(file_paths, tools, deadline):
+    """Extract metadata for a chunk of files inside a scan worker process"""
+    results = []
+    for file_path, metadata in extract_many(file_paths, tools, deadline):
+        if isinstance(metadata, Exception):
+            results.append({"path": file_path, "error": str(metadata)})
+        else:
+            results.append({"path": file_path, "metadata": metadata})
+    # Pool workers exit without running atexit handlers
+    LOGGER.flush()
+    return results
+
+def iter_scan_paths(root):
+    """Yield every regular file below root, without following symlinks"""
+    if os.path.isfile(root):
+        yield root
+        return
+    stack = [root]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry.path
+        except OSError as e:
+            log_message("WARNING", "SCAN", f"Cannot read directory: {str(e)}")
+
+def scan_directory(root, workers=None, output='-', checkpoint=None, tools=None, deadline=None, quiet=False,
+                   chunk_size=None):
+    """Extract metadata for every file under root and write one JSON object per line"""
+    global LOG_OUTPUT
+    LOG_OUTPUT = None if quiet else sys.stderr
+    workers = workers or os.cpu_count() or 2
+    chunk_size = chunk_size or app.config['EXIFTOOL_BATCH_FILES']
+    # Probe before the pool starts so forked workers inherit the results
+    TOOL_REGISTRY.probe()
+
+    done_paths = set()
+    if checkpoint and os.path.exists(checkpoint):
+        with open(checkpoint, encoding='utf-8') as f:
+            done_paths = {line.rstrip('\n') for line in f if line.strip()}
+        log_message("INFO", "SCAN", f"Resuming, {len(done_paths)} files already done")
+
+    out = sys.stdout if output == '-' else open(output, 'a' if done_paths else 'w', encoding='utf-8')
+    checkpoint_file = open(checkpoint, 'a', encoding='utf-8') if checkpoint else None
+
+    stats = {"files": 0, "bytes": 0, "errors": 0, "timed_out": 0, "resumed": len(done_paths), "tool_seconds": {}}
+    started = time.monotonic()
+
+    def record(result):
+        out.write(json.dumps(result) + '\n')
+        out.flush()
+        if checkpoint_file:
+            checkpoint_file.write(result["path"] + '\n')
+            checkpoint_file.flush()
+
+        stats["files"] += 1
+        metadata = result.get("metadata")
+        if metadata is None:
+            stats["errors"] += 1
+            return
+        stats["bytes"] += metadata["file_info"].get("size", 0)
+        pipeline = metadata["_pipeline"]
+        stats["timed_out"] += bool(pipeline["timed_out"])
+        for name, seconds in pipeline["timings"].items():
+            stats["tool_seconds"][name] = stats["tool_seconds"].get(name, 0) + seconds
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_scan_worker_init, initargs=(quiet,)) as pool:
+            pending = set()
+            todo = (file_path for file_path in iter_scan_paths(root) if file_path not in done_paths)
+            for chunk in chunk_files(todo, max_files=chunk_size):
+                # Keep a bounded number of chunks in flight instead of queueing the whole tree
+                if len(pending) >= workers * 2:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        for result in future.result():
+                            record(result)
+                pending.add(pool.submit(_scan_chunk, chunk, tools, deadline))
+
+            for future in as_completed(pending):
+                for result in future.result():
+                    record(result)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if checkpoint_file:
+            checkpoint_file.close()
+
+    elapsed = time.monotonic() - started
+    summary = {
+        "files": stats["files"],
+        "resumed": stats["resumed"],
+        "errors": stats["errors"],
+        "timed_out": stats["timed_out"],
+        "bytes": stats["bytes"],
+        "elapsed": round(elapsed, 3),
+        "files_per_second": round(stats["files"] / elapsed, 2) if elapsed else 0,
+        "mb_per_second": round(stats["bytes"] / (1024 * 1024) / elapsed, 2) if elapsed else 0,
+        "tool_seconds": {name: round(seconds, 3) for name, seconds in sorted(stats["tool_seconds"].items())},
+    }
+    print(json.dumps({"summary": summary}), file=sys.stderr)
+    return summary
+
+def server_timeout():
+    """Seconds a request may take: the extraction deadline plus time for the upload and response"""
+    return app.config['SERVER_TIMEOUT'] or app.config['EXTRACTION_DEADLINE'] + 30
+
+# Requests being handled by this process, waited for on shutdown
+_inflight = 0
+_inflight_lock = threading.Lock()
+
+@app.before_request
+def _request_started():
+    global _inflight
+    with _inflight_lock:
+        _inflight += 1
+
+@app.teardown_request
+def _request_finished(exc=None):
+    global _inflight
+    with _inflight_lock:
+        _inflight -= 1
+
+def drain(timeout):
+    """Wait up to timeout seconds for in-flight requests and background jobs of this process"""
+    deadline = time.monotonic() + timeout
+    log_message("INFO", "SYSTEM", f"Draining {_inflight} requests and {JOB_QUEUE.depth()} queued jobs")
+    while _inflight > 0 and time.monotonic() < deadline:
+        time.sleep(0.1)
+    JOB_QUEUE.drain(max(0, deadline - time.monotonic()))
+    EXIFTOOL_POOL.close()
+    LOGGER.flush()
+
+def serve(host, port):
+    """Threaded single-process server with HTTP keep-alive that drains in-flight work on SIGTERM"""
+    from werkzeug.serving import make_server, WSGIRequestHandler
+
+    class RequestHandler(WSGIRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive
+        timeout = server_timeout()
+
+    server = make_server(host, port, app, threaded=True, request_handler=RequestHandler)
+
+    def stop(signum, frame):
+        log_message("INFO", "SYSTEM", "Shutting down, no new connections accepted")
+        # shutdown() waits for serve_forever(), which runs on this (the main) thread
+        threading.Thread(target=server.shutdown, name='shutdown', daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    drain(server_timeout())
+    log_message("SUCCESS", "SYSTEM", "Server stopped")
+
+def share_state_between_workers():
+    """Move state that worker processes must agree on into SQLite files in the upload folder
+
+    Result cache and job progress default to the upload folder when not configured; the
+    search index already lives there. Tools are probed once in the master and inherited.
+    """
+    for key, name in (('METADATA_CACHE_DB', '.cache.sqlite'), ('JOB_DB', '.jobs.sqlite')):
+        if not app.config[key]:
+            app.config[key] = os.path.join(app.config['UPLOAD_FOLDER'], name)
+
+def init_worker():
+    """Per-process setup right after fork: own SQLite connections and tool re-probe timer"""
+    METADATA_CACHE.connect(app.config['METADATA_CACHE_DB'])
+    JOB_QUEUE.connect(app.config['JOB_DB'])
+    if SEARCH_INDEX is not None:
+        SEARCH_INDEX.connect(app.config['SEARCH_INDEX_DB'])
+    # gunicorn uses SIGHUP to restart workers, which re-probes in the master (on_reload)
+    TOOL_REGISTRY.start_refresh(app.config['TOOL_PROBE_INTERVAL'], sighup=False)
+    STORAGE.start()
+
+def serve_workers(host, port, workers, threads):
+    """Serve with gunicorn: worker processes with a thread pool each, graceful restart and drain"""
+    if BaseApplication is None:
+        sys.exit("--workers/--threads need gunicorn: pip install gunicorn")
+
+    share_state_between_workers()
+    timeout = server_timeout()
+
+    class Server(BaseApplication):
+        def load_config(self):
+            settings = {
+                'bind': f"{host}:{port}",
+                'workers': workers,
+                'threads': threads,
+                'worker_class': 'gthread',
+                'keepalive': app.config['SERVER_KEEPALIVE'],
+                # Workers stuck longer than a request may take are killed and replaced
+                'timeout': timeout,
+                # SIGTERM: stop accepting, give in-flight extractions and jobs this long
+                'graceful_timeout': timeout,
+                'post_fork': lambda server, worker: init_worker(),
+                'worker_exit': lambda server, worker: drain(timeout),
+                'on_reload': lambda server: TOOL_REGISTRY.probe(),
+            }
+            for key, value in settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    Server().run()
+
 def main():
     parser = argparse.ArgumentParser(
         description='Metadata Checker Tool - Termux Compatible Version with Logging',
@@ -564,6 +4241,9 @@ def main():
 Examples:
   python app.py
   python app.py -r 127.0.0.1:8080
+  python app.py -r 0.0.0.0:8080 --workers 4 --threads 8
+  python app.py scan /data/photos --workers 8 --output photos.jsonl --checkpoint photos.done
+  python app.py reindex --extract
         '''
     )
 
@@ -571,24 +4251,63 @@ Examples:
         '-r', '--run', type=str, default='127.0.0.1:8080',
         help='Run GUI server (default: 127.0.0.1:8080)'
     )
+    parser.add_argument('-W', '--workers', type=int, default=None,
+                        help='Serve with gunicorn using this many worker processes')
+    parser.add_argument('-T', '--threads', type=int, default=None,
+                        help='Request threads per gunicorn worker (default: EXTRACTOR_WORKERS)')
+
+    subparsers = parser.add_subparsers(dest='command')
+    scan_parser = subparsers.add_parser('scan', help='Scan a file or directory tree and print JSON Lines')
+    scan_parser.add_argument('path', help='File or directory to scan')
+    scan_parser.add_argument('-w', '--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    scan_parser.add_argument('-o', '--output', default='-', help='JSON Lines output file (default: stdout)')
+    scan_parser.add_argument('-c', '--checkpoint', default=None, help='File of finished paths, used to resume a scan')
+    scan_parser.add_argument('-t', '--tools', default=None, help='Comma separated extractors to run (default: routed by file type)')
+    scan_parser.add_argument('-d', '--deadline', type=float, default=None, help='Seconds allowed per file (default: EXTRACTION_DEADLINE)')
+    scan_parser.add_argument('-b', '--batch', type=int, default=None, help='Files per exiftool batch (default: EXIFTOOL_BATCH_FILES)')
+    scan_parser.add_argument('-q', '--quiet', action='store_true', help='Do not print tool logs to stderr')
+    reindex_parser = subparsers.add_parser('reindex', help='Rebuild the search index of uploads from the metadata cache')
+    reindex_parser.add_argument('--extract', action='store_true',
+                                help='Run the tools again for uploads with no cached metadata')
     
     args = parser.parse_args()
+
+    if args.command == 'scan':
+        tools = [name.strip() for name in (args.tools or '').split(',') if name.strip()] or None
+        unknown = [name for name in tools or [] if name not in EXTRACTORS]
+        if unknown:
+            parser.error(f"unknown tools: {', '.join(unknown)}")
+        scan_directory(args.path, args.workers, args.output, args.checkpoint, tools, args.deadline, args.quiet,
+                       args.batch)
+        return
+
+    if args.command == 'reindex':
+        if SEARCH_INDEX is None:
+            parser.error("SEARCH_INDEX_DB is not configured")
+        shared_cache = os.path.join(app.config['UPLOAD_FOLDER'], '.cache.sqlite')
+        if not app.config['METADATA_CACHE_DB'] and os.path.exists(shared_cache):
+            # Cache written by gunicorn workers (share_state_between_workers)
+            app.config['METADATA_CACHE_DB'] = shared_cache
+            METADATA_CACHE.connect(shared_cache)
+        if not app.config['METADATA_CACHE_DB'] and not args.extract:
+            parser.error("reindex needs METADATA_CACHE_DB to rebuild from, or --extract to run the tools again")
+        # Cache keys include the tool versions
+        TOOL_REGISTRY.probe()
+        print(json.dumps(rebuild_search_index(args.extract)))
+        return
     
     if args.run:
         host, port = args.run.split(':')
         port = int(port)
         
         log_message("START", "SYSTEM", "Starting Metadata Checker Tool")
+        TOOL_REGISTRY.probe()
+        workers = args.workers or (1 if args.threads else None)
+        if workers is None:
+            TOOL_REGISTRY.start_refresh(app.config['TOOL_PROBE_INTERVAL'])
+            STORAGE.start()
         
-        tools = {
-            'exiftool': check_tool('exiftool'),
-            'mediainfo': check_tool('mediainfo'),
-            'ffprobe': check_tool('ffprobe'),
-            'identify': check_tool('identify'),
-            'file': check_tool('file'),
-            'zipinfo': check_tool('zipinfo'),
-            'strings': check_tool('strings'),
-        }
+        tools = TOOL_REGISTRY.status()
         
         tools_info = '\n'.join([f"   {'✓' if v else '✗'} {k}" for k, v in tools.items()])
         
@@ -606,13 +4325,16 @@ Examples:
 💡 Note: 
   - Buka browser dan akses URL di atas
   - pdfinfo tidak tersedia, menggunakan exiftool untuk PDF
-  - Strings analysis tersedia via binutils
+  - Strings dan zipinfo berjalan langsung di Python
   - Logs akan ditampilkan di console
 
 Press CTRL+C to stop the server
         """)
         
-        app.run(host=host, port=port, debug=False)
+        if workers is None:
+            serve(host, port)
+        else:
+            serve_workers(host, port, workers, args.threads or app.config['EXTRACTOR_WORKERS'])
 
 if __name__ == '__main__':
     main()
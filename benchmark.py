@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the Metadata Checker extraction pipeline
+
+Generates synthetic fixtures, uploads them to the Flask app in-process and writes a
+JSON report that can be compared with an earlier run to catch regressions.
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import wave
+import zlib
+import struct
+import random
+import hashlib
+import shutil
+import zipfile
+import platform
+import argparse
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+REPORT_VERSION = 1
+
+# Lower is better for every compared metric except these
+HIGHER_IS_BETTER = {"requests_per_second", "mb_per_second"}
+
+
+def jpeg_fixture(width=256, height=256):
+    """Baseline greyscale JPEG with an EXIF block (Make, Model, DateTime, GPS)
+
+    Every 8x8 block is flat grey: one DC code and one end-of-block code, both "0".
+    """
+    def entry(tag, kind, count, value):
+        return struct.pack('>HHI', tag, kind, count) + value
+
+    def ascii_entries(tags, data_offset):
+        entries, data = [], b''
+        for tag, text in tags:
+            text = text.encode('ascii') + b'\0'
+            entries.append(entry(tag, 2, len(text), struct.pack('>I', data_offset + len(data))))
+            data += text
+        return entries, data
+
+    # TIFF header, IFD0 with three strings and a GPS pointer, then the GPS IFD
+    ifd0_offset = 8
+    ifd0_size = 2 + 4 * 12 + 4
+    strings = [(0x010F, 'Benchmark'), (0x0110, 'Synthetic Camera'), (0x0132, '2024:01:01 12:00:00')]
+    entries, data = ascii_entries(strings, ifd0_offset + ifd0_size)
+    gps_offset = ifd0_offset + ifd0_size + len(data)
+    entries.append(entry(0x8825, 4, 1, struct.pack('>I', gps_offset)))
+    ifd0 = struct.pack('>H', len(entries)) + b''.join(entries) + struct.pack('>I', 0)
+    rationals_offset = gps_offset + 2 + 2 * 12 + 4
+    gps = struct.pack('>H', 2) + entry(0x0001, 2, 2, b'S\0\0\0') + entry(0x0002, 5, 3, struct.pack('>I', rationals_offset))
+    gps += struct.pack('>I', 0) + struct.pack('>6I', 6, 1, 10, 1, 0, 1)
+    exif = b'Exif\0\0' + b'MM\0\x2a' + struct.pack('>I', ifd0_offset) + ifd0 + data + gps
+
+    def segment(marker, payload):
+        return struct.pack('>BBH', 0xFF, marker, len(payload) + 2) + payload
+
+    blocks = ((width + 7) // 8) * ((height + 7) // 8)
+    # Two zero bits per block, the last byte padded with one bits
+    scan = b'\x00' * (blocks * 2 // 8) + (bytes([(1 << (8 - blocks * 2 % 8)) - 1]) if blocks * 2 % 8 else b'')
+    return b''.join([
+        b'\xff\xd8',
+        segment(0xE1, exif),
+        segment(0xDB, b'\x00' + b'\x01' * 64),
+        segment(0xC0, struct.pack('>BHHB', 8, height, width, 1) + b'\x01\x11\x00'),
+        segment(0xC4, b'\x00' + b'\x01' + b'\x00' * 15 + b'\x00'),
+        segment(0xC4, b'\x10' + b'\x01' + b'\x00' * 15 + b'\x00'),
+        segment(0xDA, b'\x01\x01\x00\x00\x3f\x00'),
+        scan,
+        b'\xff\xd9',
+    ])
+
+
+def png_fixture(width=512, height=512, seed=0):
+    """RGB PNG of noise with a tEXt comment"""
+    def chunk(kind, payload):
+        return struct.pack('>I', len(payload)) + kind + payload + struct.pack('>I', zlib.crc32(kind + payload))
+
+    rng = random.Random(seed)
+    rows = b''.join(b'\x00' + rng.randbytes(width * 3) for _ in range(height))
+    return b''.join([
+        b'\x89PNG\r\n\x1a\n',
+        chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)),
+        chunk(b'tEXt', b'Comment\0benchmark fixture'),
+        chunk(b'IDAT', zlib.compress(rows, 6)),
+        chunk(b'IEND', b''),
+    ])
+
+
+def pdf_fixture(pages=20):
+    """PDF with an Info dictionary and a line of text per page"""
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>', None,
+               b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+               b'<< /Title (Benchmark) /Author (Metadata Checker) /Creator (benchmark.py) >>']
+    kids = []
+    for page in range(pages):
+        text = f'BT /F1 12 Tf 72 720 Td (Page {page + 1} password=benchmark) Tj ET'.encode('ascii')
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(text), text))
+        objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R '
+                       b'/Resources << /Font << /F1 3 0 R >> >> >>' % len(objects))
+        kids.append(len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(b'%d 0 R' % kid for kid in kids), pages)
+
+    out = io.BytesIO()
+    out.write(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b'%d 0 obj\n%s\nendobj\n' % (number, body))
+    xref = out.tell()
+    out.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b'%010d 00000 n \n' % offset)
+    out.write(b'trailer\n<< /Size %d /Root 1 0 R /Info 4 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def wav_fixture(seconds=5, rate=44100, seed=0):
+    """16-bit stereo WAV of noise"""
+    out = io.BytesIO()
+    with wave.open(out, 'wb') as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(random.Random(seed).randbytes(seconds * rate * 4))
+    return out.getvalue()
+
+
+def zip_fixture(entries=2000, seed=0):
+    """Zip with many small text and binary members"""
+    rng = random.Random(seed)
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for i in range(entries):
+            if i % 2:
+                zf.writestr(f'data/{i // 100}/blob_{i}.bin', rng.randbytes(256))
+            else:
+                zf.writestr(f'docs/{i // 100}/note_{i}.txt', f'note {i} token=bench{i}\n' * 8)
+    return out.getvalue()
+
+
+def mp4_fixture(folder, seconds=5):
+    """H.264/AAC MP4 made by ffmpeg, or None when ffmpeg is not installed"""
+    if not shutil.which('ffmpeg'):
+        return None
+    path = os.path.join(folder, 'video.mp4')
+    subprocess.run([
+        'ffmpeg', '-v', 'error', '-y',
+        '-f', 'lavfi', '-i', f'testsrc=duration={seconds}:size=640x360:rate=25',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-c:a', 'aac', '-shortest', path,
+    ], check=True, capture_output=True, timeout=120)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def make_fixtures(folder, large_mb=32, seed=1):
+    """Write the benchmark corpus to folder and return {name: path}"""
+    fixtures = {
+        'photo.jpg': jpeg_fixture(),
+        'image.png': png_fixture(seed=seed),
+        'document.pdf': pdf_fixture(),
+        'audio.wav': wav_fixture(seed=seed),
+        'archive.zip': zip_fixture(seed=seed),
+        'large.bin': random.Random(seed).randbytes(large_mb * 1024 * 1024),
+    }
+    video = mp4_fixture(folder)
+    if video is not None:
+        fixtures['video.mp4'] = video
+
+    paths = {}
+    for name, data in fixtures.items():
+        paths[name] = os.path.join(folder, name)
+        with open(paths[name], 'wb') as f:
+            f.write(data)
+    return paths
+
+
+class ResourceSampler:
+    """Samples RSS of this process plus its children, and the number of child processes"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_subprocesses = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='bench-sampler', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        children = descendants(os.getpid())
+        rss = sum(rss_bytes(pid) for pid in [os.getpid()] + children)
+        self.peak_rss = max(self.peak_rss, rss)
+        self.peak_subprocesses = max(self.peak_subprocesses, len(children))
+
+
+def descendants(pid):
+    """pids of every process below pid, read from /proc (empty where there is no /proc)"""
+    parents = {}
+    try:
+        names = os.listdir('/proc')
+    except OSError:
+        return []
+    for name in names:
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat', 'rb') as f:
+                # The command may contain spaces, the fields after its closing parenthesis don't
+                fields = f.read().rsplit(b')', 1)[1].split()
+            parents.setdefault(int(fields[1]), []).append(int(name))
+        except (OSError, IndexError, ValueError):
+            continue
+
+    found, stack = [], [pid]
+    while stack:
+        for child in parents.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+def rss_bytes(pid):
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def summarize(samples):
+    """mean, p50, p95 and max in milliseconds of a list of durations in seconds"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))]
+
+    return {
+        "runs": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": round(percentile(0.5) * 1000, 3),
+        "p95_ms": round(percentile(0.95) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def upload(client, app, name, data, cold):
+    """POST one fixture to /api/upload, dropping its cached results first for a cold run
+
+    Returns (seconds, file_id, metadata). The upload is kept, a warm run needs it to
+    still hold the content's cached results; remove it with remove_uploads().
+    """
+    if cold:
+        app.METADATA_CACHE.invalidate(hashlib.sha256(data).hexdigest())
+    started = time.perf_counter()
+    response = client.post('/api/upload', data={'file': (io.BytesIO(data), name)})
+    elapsed = time.perf_counter() - started
+    body = response.get_json(silent=True) or {}
+    if response.status_code != 200:
+        raise RuntimeError(f"{name}: HTTP {response.status_code} {body.get('error', '')}")
+    return elapsed, body['file_id'], body['metadata']
+
+
+def remove_uploads(app, file_ids):
+    """Uploads are not what is being measured, keep the folder small"""
+    for file_id in file_ids:
+        app.remove_upload(os.path.join(app.app.config['UPLOAD_FOLDER'], file_id))
+
+
+def run_benchmark(repeat=5, clients=8, requests=100, large_mb=32, seed=1, log=print):
+    """Run every measurement and return the report as a dict"""
+    workdir = tempfile.mkdtemp(prefix='metadata-bench-')
+    fixture_dir = os.path.join(workdir, 'fixtures')
+    os.makedirs(fixture_dir)
+    here = os.path.dirname(os.path.abspath(__file__))
+    cwd = os.getcwd()
+    # app.py keeps uploads, objects and databases relative to the working directory
+    os.chdir(workdir)
+    sys.path.insert(0, here)
+    try:
+        import app
+        app.LOG_OUTPUT = None
+        app.app.config['UPLOAD_TTL'] = None
+        app.STORAGE.ttl = None
+        tools = app.TOOL_REGISTRY.probe()
+        client = app.app.test_client()
+
+        log(f"Generating fixtures in {fixture_dir}")
+        paths = make_fixtures(fixture_dir, large_mb, seed)
+        fixtures = {}
+        for name, path in paths.items():
+            with open(path, 'rb') as f:
+                fixtures[name] = f.read()
+
+        report = {
+            "version": REPORT_VERSION,
+            "created": datetime.now().isoformat(),
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "tools": {name: tool["version"] for name, tool in tools.items()},
+            },
+            "settings": {"repeat": repeat, "clients": clients, "requests": requests, "large_mb": large_mb,
+                         "seed": seed},
+            "fixtures": {name: len(data) for name, data in fixtures.items()},
+            "tools": {},
+            "end_to_end": {},
+        }
+
+        with ResourceSampler() as sampler:
+            for name, data in fixtures.items():
+                log(f"Extracting {name} ({len(data)} bytes) x{repeat}")
+                cold, warm, per_tool = [], [], {}
+                for _ in range(repeat):
+                    elapsed, cold_id, metadata = upload(client, app, name, data, cold=True)
+                    cold.append(elapsed)
+                    for tool, seconds in metadata["_pipeline"]["timings"].items():
+                        per_tool.setdefault(tool, []).append(seconds)
+                    elapsed, warm_id, metadata = upload(client, app, name, data, cold=False)
+                    if not metadata["_pipeline"].get("cached"):
+                        raise RuntimeError(f"{name}: warm upload was not served from the metadata cache")
+                    warm.append(elapsed)
+                    remove_uploads(app, [cold_id, warm_id])
+                report["end_to_end"][name] = {"cold": summarize(cold), "warm": summarize(warm)}
+                report["tools"][name] = {tool: summarize(samples) for tool, samples in sorted(per_tool.items())}
+
+            log(f"Sending {requests} cold uploads from {clients} concurrent clients")
+            names = list(fixtures)
+            latencies, errors = [], []
+            lock = threading.Lock()
+            local = threading.local()
+
+            def one(i):
+                if not hasattr(local, 'client'):
+                    local.client = app.app.test_client()
+                name = names[i % len(names)]
+                try:
+                    elapsed, file_id, _ = upload(local.client, app, name, fixtures[name], cold=True)
+                    remove_uploads(app, [file_id])
+                    with lock:
+                        latencies.append(elapsed)
+                except Exception as e:
+                    with lock:
+                        errors.append(str(e))
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=clients) as pool:
+                list(pool.map(one, range(requests)))
+            elapsed = time.perf_counter() - started
+            sent = sum(len(fixtures[names[i % len(names)]]) for i in range(requests))
+            report["concurrency"] = dict(
+                summarize(latencies) or {},
+                clients=clients,
+                requests=requests,
+                errors=len(errors),
+                error_samples=errors[:5],
+                requests_per_second=round(requests / elapsed, 2),
+                mb_per_second=round(sent / (1024 * 1024) / elapsed, 2),
+            )
+
+        report["resources"] = {
+            "peak_rss_bytes": sampler.peak_rss,
+            "peak_subprocesses": sampler.peak_subprocesses,
+        }
+        app.EXIFTOOL_POOL.close()
+        return report
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def comparable_metrics(report):
+    """Flatten a report into {metric path: value} for the numbers worth comparing"""
+    metrics = {}
+    for name, result in report.get("end_to_end", {}).items():
+        for mode, stats in result.items():
+            if stats:
+                metrics[f"end_to_end.{name}.{mode}.p50_ms"] = stats["p50_ms"]
+                metrics[f"end_to_end.{name}.{mode}.p95_ms"] = stats["p95_ms"]
+    for name, tools in report.get("tools", {}).items():
+        for tool, stats in tools.items():
+            if stats:
+                metrics[f"tools.{name}.{tool}.p50_ms"] = stats["p50_ms"]
+    concurrency = report.get("concurrency", {})
+    for key in ("p50_ms", "p95_ms", "requests_per_second", "mb_per_second"):
+        if key in concurrency:
+            metrics[f"concurrency.{key}"] = concurrency[key]
+    for key, value in report.get("resources", {}).items():
+        metrics[f"resources.{key}"] = value
+    return metrics
+
+
+def compare_reports(baseline, current, threshold=0.1, min_ms=1.0):
+    """List metrics that got worse by more than threshold (a fraction) since baseline
+
+    Latencies under min_ms in both runs are ignored, they are mostly noise.
+    Returns [(metric, baseline value, current value, relative change)], worst first.
+    """
+    before = comparable_metrics(baseline)
+    after = comparable_metrics(current)
+    regressions = []
+    for metric, old in before.items():
+        new = after.get(metric)
+        if new is None or not old:
+            continue
+        if metric.endswith('_ms') and max(old, new) < min_ms:
+            continue
+        change = (new - old) / old
+        worse = -change if metric.rsplit('.', 1)[-1] in HIGHER_IS_BETTER else change
+        if worse > threshold:
+            regressions.append((metric, old, new, worse))
+    return sorted(regressions, key=lambda item: item[3], reverse=True)
+
+
+def print_comparison(baseline, current, threshold):
+    regressions = compare_reports(baseline, current, threshold)
+    if not regressions:
+        print(f"No regressions over {threshold:.0%}")
+        return 0
+    print(f"{len(regressions)} regressions over {threshold:.0%}:")
+    for metric, old, new, worse in regressions:
+        print(f"  {metric}: {old} -> {new} ({worse:+.0%} worse)")
+    return 1
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the metadata extraction pipeline on synthetic fixtures',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''
+Examples:
+  python benchmark.py --output baseline.json
+  python benchmark.py --output new.json --baseline baseline.json
+  python benchmark.py --compare baseline.json new.json
+        '''
+    )
+    parser.add_argument('-o', '--output', default=None, help='Write the JSON report here (default: stdout)')
+    parser.add_argument('-n', '--repeat', type=int, default=5, help='Cold and warm uploads per fixture (default: 5)')
+    parser.add_argument('-c', '--clients', type=int, default=8, help='Concurrent clients (default: 8)')
+    parser.add_argument('-r', '--requests', type=int, default=100, help='Uploads sent by the clients (default: 100)')
+    parser.add_argument('--large-mb', type=int, default=32, help='Size of the large binary fixture (default: 32)')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for the generated fixtures (default: 1)')
+    parser.add_argument('-b', '--baseline', default=None, help='Compare the new report with this one')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'), help='Only compare two reports')
+    parser.add_argument('-t', '--threshold', type=float, default=0.1,
+                        help='Relative slowdown reported as a regression (default: 0.1)')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0], encoding='utf-8') as f:
+            baseline = json.load(f)
+        with open(args.compare[1], encoding='utf-8') as f:
+            current = json.load(f)
+        sys.exit(print_comparison(baseline, current, args.threshold))
+
+    report = run_benchmark(args.repeat, args.clients, args.requests, args.large_mb, args.seed,
+                           log=lambda message: print(message, file=sys.stderr))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        sys.exit(print_comparison(baseline, report, args.threshold))
+
+
+if __name__ == '__main__':
+    main()
@@ -126,6 +126,7 @@ function handleFileUpload(file) {
 
     const formData = new FormData();
     formData.append("file", file);
+    formData.append("defer", "1");
 
     fetch("/api/upload", {
         method: "POST",
@@ -135,17 +136,53 @@ function handleFileUpload(file) {
     .then((data) => {
         if (data.success) {
             currentFileId = data.file_id;
-            displayFileInfo(data.metadata.file_info);
-            displayAllMetadata(data.metadata);
+            displayFileInfo(data.file_info);
             showToast("File uploaded successfully", "success");
+            streamMetadata(data.file_id);
         } else {
+            showSpinner(false);
             showToast(data.error || "Upload failed", "error");
         }
     })
     .catch((err) => {
+        showSpinner(false);
         showToast("Upload error: " + err.message, "error");
-    })
-    .finally(() => showSpinner(false));
+    });
+}
+
+function streamMetadata(fileId) {
+    const metadataList = document.getElementById("metadataList");
+    metadataList.innerHTML = '';
+    document.getElementById("metadataSection").style.display = "block";
+    document.getElementById("emptyState").style.display = "none";
+
+    const source = new EventSource(`/api/metadata/${encodeURIComponent(fileId)}/stream`);
+
+    source.addEventListener("tool", (e) => {
+        const { tool, data } = JSON.parse(e.data);
+        metadataList.insertAdjacentHTML("beforeend", renderToolSection(tool, data));
+        filterMetadata();
+        showSpinner(false);
+    });
+
+    source.addEventListener("done", (e) => {
+        source.close();
+        showSpinner(false);
+        if (!metadataList.innerHTML) {
+            metadataList.innerHTML = '<div class="metadata-item"><div class="metadata-value">No metadata found</div></div>';
+        }
+        const pipeline = JSON.parse(e.data);
+        if (pipeline.timed_out && pipeline.timed_out.length) {
+            showToast(`Timed out: ${pipeline.timed_out.join(", ")}`, "error");
+        }
+    });
+
+    source.onerror = () => {
+        // EventSource reconnects by default, a stream that dies halfway is not resumable
+        source.close();
+        showSpinner(false);
+        showToast("Metadata stream interrupted", "error");
+    };
 }
 
 function displayFileInfo(fileInfo) {
@@ -184,21 +221,7 @@ function displayAllMetadata(metadata) {
 
     // Display metadata from all tools
     Object.entries(metadata).forEach(([toolName, toolData]) => {
-        if (toolData && typeof toolData === 'object') {
-            if (toolData.error) {
-                html += `<div class="metadata-tool-section">
-                            <h3>${escapeHtml(toolName.toUpperCase())}</h3>
-                            <div class="metadata-item">
-                                <div class="metadata-value error">${escapeHtml(toolData.error)}</div>
-                            </div>
-                         </div>`;
-            } else if (Object.keys(toolData).length > 0) {
-                html += `<div class="metadata-tool-section">
-                            <h3>${escapeHtml(toolName.toUpperCase())}</h3>
-                            ${displayMetadataObject(toolData, toolName)}
-                         </div>`;
-            }
-        }
+        html += renderToolSection(toolName, toolData);
     });
 
     metadataList.innerHTML = html || '<div class="metadata-item"><div class="metadata-value">No metadata found</div></div>';
@@ -206,6 +229,27 @@ function displayAllMetadata(metadata) {
     emptyState.style.display = "none";
 }
 
+function renderToolSection(toolName, toolData) {
+    // Keys starting with "_" carry pipeline details, not tool output
+    if (toolName.startsWith('_') || !toolData || typeof toolData !== 'object') return '';
+
+    if (toolData.error) {
+        return `<div class="metadata-tool-section">
+                    <h3>${escapeHtml(toolName.toUpperCase())}</h3>
+                    <div class="metadata-item">
+                        <div class="metadata-value error">${escapeHtml(toolData.error)}</div>
+                    </div>
+                 </div>`;
+    }
+    if (Object.keys(toolData).length > 0) {
+        return `<div class="metadata-tool-section">
+                    <h3>${escapeHtml(toolName.toUpperCase())}</h3>
+                    ${displayMetadataObject(toolData, toolName)}
+                 </div>`;
+    }
+    return '';
+}
+
 function displayMetadataObject(obj, prefix = '') {
     let html = '';
     Object.entries(obj).forEach(([key, value]) => {
@@ -296,8 +340,8 @@ function filterMetadata() {
     const items = document.querySelectorAll(".metadata-item");
 
     items.forEach((item) => {
-        const key = item.querySelector(".metadata-key").textContent.toLowerCase();
-        const value = item.querySelector(".metadata-value").textContent.toLowerCase();
+        const key = (item.querySelector(".metadata-key")?.textContent || "").toLowerCase();
+        const value = (item.querySelector(".metadata-value")?.textContent || "").toLowerCase();
         item.style.display = key.includes(searchTerm) || value.includes(searchTerm) ? "block" : "none";
     });
 }